@@ -1 +1,20 @@
 from .service import PlaywrightService as PlaywrightService
+from .tracing import TraceSampler as TraceSampler
+from .metrics import PerformanceCollector as PerformanceCollector
+from .metrics import RenderRecord as RenderRecord
+from .reaper import Reaper as Reaper
+from .scheduler import LeaseScheduler as LeaseScheduler
+from .scheduler import Priority as Priority
+from .scheduler import QuotaExceeded as QuotaExceeded
+from .scheduler import TenantQuota as TenantQuota
+from .pool import PersistentContextPool as PersistentContextPool
+from .leaks import LeakDetector as LeakDetector
+from .leaks import LiveResource as LiveResource
+from .worker import WorkerError as WorkerError
+from .worker import WorkerPool as WorkerPool
+from .image import ImagePipeline as ImagePipeline
+from .pdf import PdfJob as PdfJob
+from .adaptive import AdaptiveConcurrency as AdaptiveConcurrency
+from .stall import StallMonitor as StallMonitor
+from .stall import StallReport as StallReport
+from .registry import ContextRegistry as ContextRegistry
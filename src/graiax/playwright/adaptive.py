@@ -0,0 +1,118 @@
+from typing import Any
+
+
+class AdaptiveConcurrency:
+    """根据租借耗时与浏览器错误自动调整并发上限（AIMD）
+
+    每收集 `window` 次租借的结果进行一次调整：窗口内出现浏览器错误，或平均占用时间超过基准耗时的 `tolerance` 倍
+    （或超过 `target_latency`）时，将上限乘以 `decrease`；否则若窗口内容量曾被占满，则将上限增加 `increase`。
+    基准耗时取各窗口平均占用时间的最小值，并缓慢向当前值回升，以适应负载内容的变化。
+
+    占用时间指从获得页面或上下文到归还所花费的时间，不包括在调度器中排队的时间。
+
+    Args:
+        initial (int): 初始并发上限。默认为 4
+        min_limit (int): 并发上限的下限。默认为 1
+        max_limit (int): 并发上限的上限。默认为 64
+        target_latency (float | None): 平均占用时间的目标值（秒），传入时代替基准耗时的 `tolerance` 倍作为阈值
+        tolerance (float): 平均占用时间超过基准耗时多少倍时视为过载。默认为 2.0
+        increase (int): 每次增加的并发数。默认为 1
+        decrease (float): 过载时并发上限的缩减系数，取值范围为 0 ~ 1。默认为 0.7
+        window (int): 每次调整所需的样本数量。默认为 20
+        recovery (float): 基准耗时向当前值回升的系数，取值范围为 0 ~ 1。默认为 0.05
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        target_latency: float | None = None,
+        tolerance: float = 2.0,
+        increase: int = 1,
+        decrease: float = 0.7,
+        window: int = 20,
+        recovery: float = 0.05,
+    ) -> None:
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("limits must satisfy 1 <= min_limit <= initial <= max_limit")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.tolerance = tolerance
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.recovery = recovery
+
+        self.baseline: float | None = None  # 基准占用时间（秒）
+        self.latency: float | None = None  # 最近一个窗口的平均占用时间（秒）
+        self.increases: int = 0
+        self.decreases: int = 0
+        self._samples = 0
+        self._total = 0.0
+        self._errors = 0
+        self._saturated = False
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """当前的并发上限与调整计数"""
+        return {
+            "limit": self.limit,
+            "baseline": self.baseline,
+            "latency": self.latency,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+    def observe(self, latency: float, *, error: bool = False, saturated: bool = False) -> int | None:
+        """记录一次租借的结果
+
+        Args:
+            latency (float): 租借的占用时间（秒）
+            error (bool): 租借期间是否发生了浏览器错误（例如页面或浏览器崩溃），不包括 Playwright 的等待超时
+            saturated (bool): 租借结束时容量是否已被占满或仍有请求在排队
+
+        Returns:
+            int | None: 调整后的并发上限，未调整时为 None
+        """
+        self._samples += 1
+        self._total += latency
+        self._errors += error
+        self._saturated |= saturated
+        if self._samples < self.window:
+            return None
+
+        average = self._total / self._samples
+        overloaded = self._errors > 0 or self._overloaded(average)
+        saturated = self._saturated
+        self.latency = average
+        if self.baseline is None or average < self.baseline:
+            self.baseline = average
+        else:
+            self.baseline += (average - self.baseline) * self.recovery
+        self._samples, self._total, self._errors, self._saturated = 0, 0.0, 0, False
+
+        if overloaded:
+            limit = max(self.min_limit, int(self.limit * self.decrease))
+        elif saturated:
+            limit = min(self.max_limit, self.limit + self.increase)
+        else:
+            return None
+        if limit == self.limit:
+            return None
+        if limit > self.limit:
+            self.increases += 1
+        else:
+            self.decreases += 1
+        self.limit = limit
+        return limit
+
+    def _overloaded(self, average: float) -> bool:
+        if self.target_latency is not None:
+            return average > self.target_latency
+        return self.baseline is not None and average > self.baseline * self.tolerance
@@ -0,0 +1,190 @@
+import asyncio
+import functools
+import io
+import time
+from concurrent.futures import Executor
+from typing import Any, Literal
+
+ImageFormat = Literal["png", "jpeg", "webp"]
+
+PIPELINE_STAGES = ("decode", "trim", "resize", "tile", "encode")
+
+
+def _require_pillow() -> None:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            "Pillow is required for ImagePipeline, install it with `pip install graiax-playwright[image]`"
+        ) from None
+
+
+def process_image(
+    data: bytes,
+    *,
+    trim: bool = False,
+    trim_tolerance: int = 0,
+    max_size: tuple[int, int] | None = None,
+    format: ImageFormat | None = None,
+    quality: int | None = None,
+    tile_height: int | None = None,
+) -> tuple[list[bytes], dict[str, float]]:
+    """对截图依次进行裁边、缩放、切分与重新编码
+
+    Args:
+        data (bytes): 截图数据
+        trim (bool): 是否裁去四周与左上角像素颜色相同的空白
+        trim_tolerance (int): 裁边时视为相同颜色的最大差值（0 ~ 255）
+        max_size (tuple[int, int] | None): 图片的最大宽高，超出时按比例缩小
+        format (ImageFormat | None): 输出格式，为 None 时与输入相同
+        quality (int | None): JPEG 与 WebP 的输出质量
+        tile_height (int | None): 按该高度将图片纵向切分为多张，为 None 时不切分
+
+    Returns:
+        tuple[list[bytes], dict[str, float]]: 处理后的图片与各阶段的耗时（秒）
+    """
+    from PIL import Image, ImageChops
+
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+
+    def lap(stage: str) -> None:
+        nonlocal start
+        now = time.perf_counter()
+        timings[stage] = now - start
+        start = now
+
+    # BytesIO 直接引用传入的 bytes，不会复制
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    source_format = (image.format or "PNG").lower()
+    lap("decode")
+
+    if trim:
+        background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+        diff = ImageChops.difference(image, background).convert("L")
+        if trim_tolerance > 0:
+            diff = diff.point(lambda value: 255 if value > trim_tolerance else 0)
+        if (box := diff.getbbox()) is not None:
+            image = image.crop(box)
+        lap("trim")
+
+    if max_size is not None and (image.width > max_size[0] or image.height > max_size[1]):
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        lap("resize")
+
+    tiles = [image]
+    if tile_height is not None and image.height > tile_height:
+        tiles = [
+            image.crop((0, top, image.width, min(top + tile_height, image.height)))
+            for top in range(0, image.height, tile_height)
+        ]
+        lap("tile")
+
+    output_format = format or source_format
+    options: dict[str, Any] = {}
+    if output_format in ("jpeg", "webp") and quality is not None:
+        options["quality"] = quality
+    results = []
+    for tile in tiles:
+        if output_format == "jpeg" and tile.mode not in ("RGB", "L"):
+            tile = tile.convert("RGB")
+        buffer = io.BytesIO()
+        tile.save(buffer, format=output_format.upper(), **options)
+        results.append(buffer.getvalue())
+    lap("encode")
+    return results, timings
+
+
+class _StageStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def as_dict(self) -> dict[str, float]:
+        return {"count": self.count, "average": self.total / self.count if self.count else 0.0, "max": self.max}
+
+
+class ImagePipeline:
+    """截图后处理流水线，需要安装 Pillow（`graiax-playwright[image]`）
+
+    依次进行裁边、缩放、切分与重新编码，处理过程在线程池（或传入的进程池）中进行，不会阻塞事件循环。
+
+    Args:
+        trim (bool): 是否裁去四周与左上角像素颜色相同的空白。默认为 False
+        trim_tolerance (int): 裁边时视为相同颜色的最大差值（0 ~ 255）。默认为 0
+        max_size (tuple[int, int] | None): 图片的最大宽高，超出时按比例缩小，例如聊天平台的图片尺寸限制
+        format (ImageFormat | None): 输出格式，为 None 时与截图格式相同
+        quality (int | None): JPEG 与 WebP 的输出质量
+        tile_height (int | None): 按该高度将超长截图纵向切分为多张，仅对 `process_tiles()` 与 `render_tiles()` 生效
+        executor (Executor | None): 执行处理的线程池或进程池，为 None 时使用事件循环的默认线程池
+    """
+
+    def __init__(
+        self,
+        *,
+        trim: bool = False,
+        trim_tolerance: int = 0,
+        max_size: tuple[int, int] | None = None,
+        format: ImageFormat | None = None,
+        quality: int | None = None,
+        tile_height: int | None = None,
+        executor: Executor | None = None,
+    ) -> None:
+        _require_pillow()
+        if tile_height is not None and tile_height < 1:
+            raise ValueError("tile_height must be greater than 0")
+        self.trim = trim
+        self.trim_tolerance = trim_tolerance
+        self.max_size = max_size
+        self.format = format
+        self.quality = quality
+        self.tile_height = tile_height
+        self.executor = executor
+
+        self.processed: int = 0
+        self._stages = {stage: _StageStats() for stage in PIPELINE_STAGES}
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """处理次数与各阶段的耗时（秒）"""
+        return {
+            "processed": self.processed,
+            "stages": {stage: stats.as_dict() for stage, stats in self._stages.items() if stats.count},
+        }
+
+    async def _run(self, data: bytes, tile_height: int | None) -> list[bytes]:
+        loop = asyncio.get_running_loop()
+        # 使用 partial 而不是闭包，以便在进程池中执行
+        job = functools.partial(
+            process_image,
+            data,
+            trim=self.trim,
+            trim_tolerance=self.trim_tolerance,
+            max_size=self.max_size,
+            format=self.format,
+            quality=self.quality,
+            tile_height=tile_height,
+        )
+        results, timings = await loop.run_in_executor(self.executor, job)
+        self.processed += 1
+        for stage, elapsed in timings.items():
+            self._stages[stage].add(elapsed)
+        return results
+
+    async def process(self, data: bytes) -> bytes:
+        """处理一张截图，不进行切分"""
+        (result,) = await self._run(data, None)
+        return result
+
+    async def process_tiles(self, data: bytes) -> list[bytes]:
+        """处理一张截图，并按 `tile_height` 切分为多张"""
+        return await self._run(data, self.tile_height)
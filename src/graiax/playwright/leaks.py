@@ -0,0 +1,188 @@
+import time
+from collections.abc import Iterable
+from typing import Any, Literal
+
+from playwright.async_api import BrowserContext, Page
+
+from .i18n import N_
+from .metrics import RenderRecord
+from .utils import log
+
+
+class LiveResource:
+    """一个尚未关闭的页面或上下文
+
+    Attributes:
+        kind (Literal["page", "context"]): 资源的类型
+        resource (Page | BrowserContext): 资源本身
+        created (float): 开始跟踪该资源的时间（`time.monotonic()`）
+        lease (int | None): 创建该资源的租借的记录编号，无法确定时为 None
+        site (str | None): 创建该资源的代码位置，无法确定时为 None
+        outlived (bool): 该资源是否在其所属的租借结束后仍未关闭
+    """
+
+    __slots__ = ("kind", "resource", "created", "lease", "site", "outlived")
+
+    def __init__(self, resource: Page | BrowserContext) -> None:
+        self.kind: Literal["page", "context"] = "page" if isinstance(resource, Page) else "context"
+        self.resource = resource
+        self.created = time.monotonic()
+        self.lease: int | None = None
+        self.site: str | None = None
+        self.outlived = False
+
+    @property
+    def age(self) -> float:
+        """资源存活的时间（秒）"""
+        return time.monotonic() - self.created
+
+    @property
+    def url(self) -> str | None:
+        """页面当前的 URL，上下文为 None"""
+        return self.resource.url if isinstance(self.resource, Page) else None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "age": self.age,
+            "url": self.url,
+            "lease": self.lease,
+            "site": self.site,
+            "outlived": self.outlived,
+        }
+
+    def __repr__(self) -> str:
+        return f"<LiveResource {self.kind} age={self.age:.1f}s url={self.url!r} site={self.site!r}>"
+
+
+class _Usage:
+    __slots__ = ("leases", "baseline", "overlapped")
+
+    def __init__(self, baseline: Iterable[Page]) -> None:
+        self.leases = 1
+        self.baseline = set(baseline)  # 第一个租借开始时上下文中已有的页面
+        self.overlapped = False  # 期间是否有多个租借同时进行
+
+
+class LeakDetector:
+    """页面与上下文的泄漏检测器
+
+    跟踪服务所创建或使用的每一个上下文，以及这些上下文中的每一个页面（包括调用方在 `context()` 租借的上下文中
+    自行创建的页面）。租借结束时，若调用方自行创建的页面仍未关闭，则视为泄漏，按 `policy` 记录警告或将其关闭。
+    启用后，每次租借都会记录发起租借的代码位置，用于定位泄漏的来源。
+
+    Args:
+        policy (Literal["warn", "close"]): 发现租借结束后仍未关闭的页面时的处理方式，`"warn"` 仅记录警告，
+            `"close"` 在记录警告的同时关闭这些页面。默认为 "warn"
+    """
+
+    def __init__(self, *, policy: Literal["warn", "close"] = "warn") -> None:
+        self.policy = policy
+        self.outlived: int = 0  # 租借结束后仍未关闭的页面数
+        self.closed: int = 0  # 被检测器关闭的页面数
+        self._live: dict[Page | BrowserContext, LiveResource] = {}
+        self._usage: dict[BrowserContext, _Usage] = {}
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """存活的资源数与泄漏计数"""
+        pages = sum(1 for entry in self._live.values() if entry.kind == "page")
+        return {
+            "pages": pages,
+            "contexts": len(self._live) - pages,
+            "outlived": self.outlived,
+            "closed": self.closed,
+        }
+
+    def live_resources(self, kind: Literal["page", "context"] | None = None) -> list[LiveResource]:
+        """列出尚未关闭的资源，按存活时间从长到短排序
+
+        Args:
+            kind (Literal["page", "context"] | None): 只列出指定类型的资源，为 None 时列出全部
+        """
+        entries = [entry for entry in self._live.values() if kind is None or entry.kind == kind]
+        return sorted(entries, key=lambda entry: entry.created)
+
+    def watch(self, context: BrowserContext) -> None:
+        """开始跟踪一个上下文及其中的页面，重复调用不会产生影响"""
+        if context in self._live:
+            return
+        self._track(context)
+        context.on("page", self._track)
+        context.on("close", self._forget)
+        for page in context.pages:
+            self._track(page)
+
+    def claim(self, resources: Iterable[Page | BrowserContext], record: RenderRecord) -> None:
+        """将服务为一次租借创建的资源归属于该租借"""
+        for resource in resources:
+            entry = self._track(resource)
+            entry.lease = record.id
+            entry.site = record.site
+
+    def begin(self, context: BrowserContext) -> None:
+        """标记一次使用了共享上下文（全局上下文或池中的上下文）的 `context()` 租借开始"""
+        self.watch(context)
+        usage = self._usage.get(context)
+        if usage is None:
+            self._usage[context] = _Usage(context.pages)
+        else:
+            usage.leases += 1
+            usage.overlapped = True
+
+    def end(self, context: BrowserContext, record: RenderRecord) -> list[Page]:
+        """标记一次使用了共享上下文的租借结束，找出租借期间由调用方创建且仍未关闭的页面
+
+        共享上下文上同时有多个租借时，无法确定调用方创建的页面属于哪一个租借，
+        因此会等到该上下文上的租借全部结束后再检查。
+
+        Returns:
+            list[Page]: 按 `policy` 需要关闭的页面
+        """
+        usage = self._usage[context]
+        usage.leases -= 1
+        if usage.leases > 0:
+            return []
+        del self._usage[context]
+
+        leftovers = []
+        for page in context.pages:
+            if page in usage.baseline or page.is_closed():
+                continue
+            entry = self._track(page)
+            if entry.lease is not None:
+                continue  # 由服务创建并负责关闭
+            if not usage.overlapped:
+                entry.lease = record.id
+                entry.site = record.site
+            entry.outlived = True
+            leftovers.append(page)
+            if entry.site is None:
+                log("warning", N_("Page {url} created during overlapping leases was not closed."), url=page.url)
+            else:
+                log(
+                    "warning",
+                    N_("Page {url} created during a lease at {site} was not closed."),
+                    url=page.url,
+                    site=entry.site,
+                )
+        self.outlived += len(leftovers)
+        if self.policy != "close":
+            return []
+        self.closed += len(leftovers)
+        return leftovers
+
+    def _track(self, resource: Page | BrowserContext) -> LiveResource:
+        entry = self._live.get(resource)
+        if entry is None:
+            entry = self._live[resource] = LiveResource(resource)
+            if isinstance(resource, Page):
+                resource.on("close", self._forget)
+        return entry
+
+    def _forget(self, resource: Page | BrowserContext) -> None:
+        self._live.pop(resource, None)
+        if isinstance(resource, BrowserContext):
+            # 上下文关闭时其中的页面不一定会逐一触发 close 事件
+            for page in [page for page in self._live if isinstance(page, Page) and page.context is resource]:
+                self._live.pop(page, None)
@@ -0,0 +1,165 @@
+import itertools
+import time
+from collections.abc import Hashable, Sequence
+from pathlib import Path
+from typing import Any, Literal
+
+from playwright.async_api import CDPSession, Page
+from playwright.async_api import Error as PWError
+
+from .i18n import N_
+from .scheduler import Priority
+from .utils import log
+
+DEFAULT_PERFORMANCE_METRICS = (
+    "LayoutCount",
+    "LayoutDuration",
+    "RecalcStyleCount",
+    "RecalcStyleDuration",
+    "ScriptDuration",
+    "TaskDuration",
+    "JSHeapUsedSize",
+    "Nodes",
+)
+
+_record_id = itertools.count(1)
+
+
+class RenderRecord:
+    """一次 `page()` / `context()` 租借的指标记录
+
+    Attributes:
+        id (int): 记录编号，在进程内递增
+        kind (Literal["page", "context"]): 租借的类型
+        priority (int): 租借的优先级
+        tenant (Hashable | None): 租借所属的租户
+        site (str | None): 发起租借的代码位置，仅在启用了 `LeakDetector` 时记录
+        started (float): 发起租借的时间戳（`time.time()`）
+        wait (float): 在调度器中排队等待的时间（秒）
+        elapsed (float | None): 从发起租借到归还所花费的时间（秒），包括排队等待的时间，租借尚未结束时为 None
+        error (BaseException | None): 租借期间抛出的异常
+        trace (Path | None): 被 `TraceSampler` 保存的 Trace 文件
+        browser (dict[str, float]): 由 `PerformanceCollector` 采集的浏览器指标在租借期间的增量
+    """
+
+    def __init__(
+        self,
+        kind: Literal["page", "context"],
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
+        site: str | None = None,
+    ) -> None:
+        self.id = next(_record_id)
+        self.kind = kind
+        self.priority = priority
+        self.tenant = tenant
+        self.site = site
+        self.started = time.time()
+        self.wait: float = 0.0
+        self.elapsed: float | None = None
+        self.error: BaseException | None = None
+        self.trace: Path | None = None
+        self.browser: dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self.elapsed = time.perf_counter() - self._start
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"<RenderRecord #{self.id} kind={self.kind} elapsed={self.elapsed} error={self.error!r}>"
+
+
+class _Probe:
+    def __init__(self, session: CDPSession, baseline: dict[str, float]) -> None:
+        self.session = session
+        self.baseline = baseline
+
+
+class PerformanceCollector:
+    """基于 CDP `Performance.getMetrics` 的页面性能指标采集器，仅支持 Chromium
+
+    在 `page()` 租借开始与结束时各采样一次，将两次采样的差值写入本次租借的 `RenderRecord.browser`，
+    并在某项指标明显高于其滑动平均值时在日志中标记。每次租借会额外产生 4 次 CDP 往返。
+
+    Args:
+        metrics (Sequence[str]): 需要采集的指标名，详见
+            <https://chromedevtools.github.io/devtools-protocol/tot/Performance/#method-getMetrics>
+        outlier_factor (float): 指标超过其滑动平均值多少倍时视为异常值。默认为 3.0
+        warmup (int): 开始判断异常值之前需要的样本数量。默认为 20
+        smoothing (float): 滑动平均的平滑系数，取值范围为 0 ~ 1。默认为 0.1
+    """
+
+    def __init__(
+        self,
+        metrics: Sequence[str] = DEFAULT_PERFORMANCE_METRICS,
+        *,
+        outlier_factor: float = 3.0,
+        warmup: int = 20,
+        smoothing: float = 0.1,
+    ) -> None:
+        self.metrics = tuple(metrics)
+        self.outlier_factor = outlier_factor
+        self.warmup = warmup
+        self.smoothing = smoothing
+
+        self.samples: int = 0
+        self.outliers: int = 0
+        self.failed: int = 0
+        self._average: dict[str, float] = {}
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """采样计数与各项指标的滑动平均值"""
+        return {
+            "samples": self.samples,
+            "outliers": self.outliers,
+            "failed": self.failed,
+            "average": dict(self._average),
+        }
+
+    async def _get_metrics(self, session: CDPSession) -> dict[str, float]:
+        result = await session.send("Performance.getMetrics")
+        return {m["name"]: m["value"] for m in result["metrics"] if m["name"] in self.metrics}
+
+    async def begin(self, page: Page) -> _Probe | None:
+        try:
+            session = await page.context.new_cdp_session(page)
+            await session.send("Performance.enable")
+            return _Probe(session, await self._get_metrics(session))
+        except PWError:
+            self.failed += 1
+            return None
+
+    async def end(self, probe: _Probe, record: RenderRecord) -> None:
+        try:
+            current = await self._get_metrics(probe.session)
+            await probe.session.detach()
+        except PWError:
+            # 调用方可能已经自行关闭了页面
+            self.failed += 1
+            return
+
+        record.browser = {name: value - probe.baseline.get(name, 0.0) for name, value in current.items()}
+        self.samples += 1
+        self._check(record)
+
+    def _check(self, record: RenderRecord) -> None:
+        outliers = []
+        for name, value in record.browser.items():
+            average = self._average.get(name)
+            if average is None:
+                self._average[name] = value
+                continue
+            if self.samples > self.warmup and average > 0 and value > average * self.outlier_factor:
+                outliers.append(f"{name}={value:.3f} (avg {average:.3f})")
+            self._average[name] = average + (value - average) * self.smoothing
+
+        if outliers:
+            self.outliers += 1
+            log(
+                "warning",
+                N_("Render #{id} has outlier browser metrics: {metrics}").format(
+                    id=record.id, metrics=", ".join(outliers)
+                ),
+            )
@@ -0,0 +1,213 @@
+import asyncio
+import base64
+import inspect
+import json
+import re
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from playwright.async_api import Page
+
+from .render import WaitUntil, load_page
+
+# 纸张尺寸（英寸），与 Playwright 的 `page.pdf(format=...)` 一致
+PAPER_FORMATS: dict[str, tuple[float, float]] = {
+    "letter": (8.5, 11),
+    "legal": (8.5, 14),
+    "tabloid": (11, 17),
+    "ledger": (17, 11),
+    "a0": (33.1, 46.8),
+    "a1": (23.4, 33.1),
+    "a2": (16.54, 23.4),
+    "a3": (11.7, 16.54),
+    "a4": (8.27, 11.7),
+    "a5": (5.83, 8.27),
+    "a6": (4.13, 5.83),
+}
+
+_UNITS = {"px": 1 / 96, "in": 1.0, "cm": 1 / 2.54, "mm": 1 / 25.4}
+
+
+def _to_inches(value: str | float | None) -> float | None:
+    if value is None:
+        return None
+    if isinstance(value, int | float):
+        return value * _UNITS["px"]
+    match = re.fullmatch(r"\s*([\d.]+)\s*(px|in|cm|mm)?\s*", value.lower())
+    if match is None:
+        raise ValueError(f"invalid length: {value!r}")
+    return float(match[1]) * _UNITS[match[2] or "px"]
+
+
+def print_options(
+    *,
+    format: str | None = None,
+    width: str | float | None = None,
+    height: str | float | None = None,
+    landscape: bool = False,
+    scale: float = 1.0,
+    print_background: bool = True,
+    margin: dict[str, str | float] | None = None,
+    header_template: str | None = None,
+    footer_template: str | None = None,
+    page_ranges: str | None = None,
+    prefer_css_page_size: bool = False,
+) -> dict[str, Any]:
+    """将与 `page.pdf()` 相同的参数转换为 CDP `Page.printToPDF` 的参数
+
+    Args:
+        format (str | None): 纸张格式，例如 "A4"、"Letter"，优先于 `width` 与 `height`
+        width (str | float | None): 纸张宽度，数字的单位为像素，字符串可以带有 px、in、cm 或 mm 单位
+        height (str | float | None): 纸张高度
+        landscape (bool): 是否横向打印
+        scale (float): 网页内容的缩放比例
+        print_background (bool): 是否打印背景
+        margin (dict[str, str | float] | None): 页边距，可包含 top、right、bottom、left，未指定的一侧为 0
+        header_template (str | None): 页眉的 HTML 模板
+        footer_template (str | None): 页脚的 HTML 模板
+        page_ranges (str | None): 打印的页码范围，例如 "1-5, 8"
+        prefer_css_page_size (bool): 是否优先使用 CSS `@page` 规则中声明的纸张尺寸
+    """
+    params: dict[str, Any] = {
+        "landscape": landscape,
+        "scale": scale,
+        "printBackground": print_background,
+        "preferCSSPageSize": prefer_css_page_size,
+        "transferMode": "ReturnAsStream",
+    }
+    if format is not None:
+        params["paperWidth"], params["paperHeight"] = PAPER_FORMATS[format.lower()]
+    else:
+        if (paper_width := _to_inches(width)) is not None:
+            params["paperWidth"] = paper_width
+        if (paper_height := _to_inches(height)) is not None:
+            params["paperHeight"] = paper_height
+    # CDP 的默认页边距约为 1cm，而 `page.pdf()` 默认为 0
+    margin = {"top": 0, "right": 0, "bottom": 0, "left": 0, **(margin or {})}
+    for side, value in margin.items():
+        params[f"margin{side.capitalize()}"] = _to_inches(value)
+    if header_template is not None or footer_template is not None:
+        params["displayHeaderFooter"] = True
+        # 未指定的一侧需要传入空模板，否则会使用 Chromium 默认的页眉页脚
+        params["headerTemplate"] = header_template or "<span></span>"
+        params["footerTemplate"] = footer_template or "<span></span>"
+    if page_ranges is not None:
+        params["pageRanges"] = page_ranges
+    return params
+
+
+def style_init_script(css: str) -> str:
+    """生成在每个文档载入时插入指定 CSS 的初始化脚本"""
+    return (
+        "(() => { const css = "
+        + json.dumps(css)
+        + "; const install = () => { const style = document.createElement('style'); style.textContent = css;"
+        " (document.head || document.documentElement).appendChild(style); };"
+        " if (document.readyState === 'loading') document.addEventListener('DOMContentLoaded', install);"
+        " else install(); })();"
+    )
+
+
+def inline_style(content: str, css: str) -> str:
+    """将 CSS 以 `<style>` 的形式插入 HTML 开头
+
+    `set_content()` 不会创建新的文档，初始化脚本不会再次执行，因此直接传入的 HTML 需要内联样式。
+    """
+    # `<style>` 中的内容不会被转义，只需避免提前闭合
+    return "<style>" + css.replace("</", "<\\/") + f"</style>{content}"
+
+
+class PdfJob:
+    """一份需要生成的 PDF
+
+    Args:
+        output (str | Path | BinaryIO): PDF 的输出位置，可以是文件路径或具有 `write()` 方法的对象，
+            `write()` 可以是异步的
+        content (str | None): 要打印的 HTML 内容，与 `url` 必须且只能传入其一
+        url (str | None): 要打印的 URL
+        wait_until (WaitUntil): 载入内容或导航时等待的事件。默认为 "load"
+    """
+
+    def __init__(
+        self,
+        output: str | Path | BinaryIO,
+        *,
+        content: str | None = None,
+        url: str | None = None,
+        wait_until: WaitUntil = "load",
+    ) -> None:
+        if (content is None) == (url is None):
+            raise ValueError("exactly one of content and url must be given")
+        self.output = output
+        self.content = content
+        self.url = url
+        self.wait_until: WaitUntil = wait_until
+
+    def __repr__(self) -> str:
+        return f"<PdfJob output={self.output!r} url={self.url!r}>"
+
+
+async def _write(writer: Any, data: bytes) -> None:
+    result = writer.write(data)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def stream_pdf(
+    page: Page,
+    output: str | Path | BinaryIO,
+    params: dict[str, Any],
+    *,
+    chunk_size: int = 1 << 20,
+) -> int:
+    """将页面打印为 PDF 并分块写入输出，不会在内存中保留整个文档，仅支持 Chromium
+
+    Args:
+        page (Page): 已载入内容的页面
+        output (str | Path | BinaryIO): 文件路径或具有 `write()` 方法的对象
+        params (dict[str, Any]): 由 `print_options()` 生成的打印参数
+        chunk_size (int): 每次读取的最大字节数。默认为 1 MiB
+
+    Returns:
+        int: 写入的字节数
+    """
+    session = await page.context.new_cdp_session(page)
+    try:
+        result = await session.send("Page.printToPDF", params)
+        handle = result["stream"]
+        file = None
+        if isinstance(output, str | Path):
+            file = await asyncio.to_thread(open, output, "wb")
+        written = 0
+        try:
+            while True:
+                chunk = await session.send("IO.read", {"handle": handle, "size": chunk_size})
+                data = base64.b64decode(chunk["data"]) if chunk.get("base64Encoded") else chunk["data"].encode()
+                if data:
+                    if file is not None:
+                        await asyncio.to_thread(file.write, data)
+                    else:
+                        await _write(output, data)
+                    written += len(data)
+                if chunk.get("eof"):
+                    break
+        finally:
+            if file is not None:
+                await asyncio.to_thread(file.close)
+            await session.send("IO.close", {"handle": handle})
+        return written
+    finally:
+        await session.detach()
+
+
+async def print_job(page: Page, job: PdfJob, params: dict[str, Any], *, css: str | None = None) -> int:
+    """在页面中载入一份 PDF 的内容并打印，`css` 需已通过 `style_init_script()` 注册到页面上
+
+    Returns:
+        int: 写入的字节数
+    """
+    content = job.content
+    if content is not None and css is not None:
+        content = inline_style(content, css)
+    await load_page(page, content=content, url=job.url, wait_until=job.wait_until)
+    return await stream_pdf(page, job.output, params)
@@ -0,0 +1,163 @@
+import asyncio
+import shutil
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+
+from playwright.async_api import BrowserContext
+from playwright.async_api import Error as PWError
+
+from .i18n import N_
+from .utils import log
+
+# 浏览器运行时在用户数据目录中创建的锁文件，复制配置文件时需要跳过
+PROFILE_LOCK_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile", "parent.lock", ".parentlock")
+
+
+def sync_profile(template: Path, target: Path) -> None:
+    """将模板用户数据目录复制到目标目录，目标目录中原有的内容会被删除"""
+    shutil.rmtree(target, ignore_errors=True)
+    try:
+        shutil.copytree(template, target, ignore=shutil.ignore_patterns(*PROFILE_LOCK_FILES), symlinks=True)
+    except shutil.Error as e:
+        # 模板正在被浏览器使用，部分文件可能在复制过程中被修改或删除
+        log(
+            "warning",
+            N_("Some files could not be copied from the template profile: {count}").format(count=len(e.args[0])),
+        )
+
+
+class _Member:
+    def __init__(self, index: int, directory: Path) -> None:
+        self.index = index
+        self.directory = directory
+        self.context: BrowserContext | None = None
+        self.active = 0
+        self.uses = 0  # 自上次同步以来的租借次数
+        self.recycles = 0
+        self.recycling = False
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"active": self.active, "uses": self.uses, "recycles": self.recycles, "recycling": self.recycling}
+
+
+class PersistentContextPool:
+    """持久性上下文池
+
+    将模板用户数据目录复制为若干份，并为每一份启动一个独立的持久性上下文，使持久性上下文模式下也可以并发渲染。
+    租借会被分配到当前使用者最少的上下文上；每个上下文被租借 `recycle_after` 次后会被关闭，
+    并从模板重新同步用户数据目录后再次启动，使其与模板中的登录状态等保持一致。
+    重新启动失败的上下文会在下一次租借时再次尝试启动；所有上下文都无法启动时，租借会抛出 `RuntimeError`。
+
+    Args:
+        template (Path): 模板用户数据目录
+        size (int): 池中上下文的数量
+        launch (Callable[[Path], Awaitable[BrowserContext]]): 以指定的用户数据目录启动持久性上下文的函数
+        recycle_after (int | None): 上下文被租借多少次后从模板重新同步，为 None 时不重新同步
+        close_timeout (float): 关闭上下文的超时时间（秒）
+    """
+
+    def __init__(
+        self,
+        template: Path,
+        size: int,
+        launch: Callable[[Path], Awaitable[BrowserContext]],
+        *,
+        recycle_after: int | None = None,
+        close_timeout: float = 10.0,
+    ) -> None:
+        if size < 1:
+            raise ValueError("size must be greater than 0")
+        self.template = template
+        self.launch = launch
+        self.recycle_after = recycle_after
+        self.close_timeout = close_timeout
+        root = template.parent / f"{template.name}-pool"
+        self._members = [_Member(i, root / str(i)) for i in range(size)]
+        self._available = asyncio.Condition()
+        self._recycling: set[asyncio.Task] = set()
+
+    @property
+    def contexts(self) -> list[BrowserContext]:
+        return [member.context for member in self._members if member.context is not None]
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {"size": len(self._members), "members": [member.as_dict() for member in self._members]}
+
+    async def start(self) -> None:
+        """从模板同步所有用户数据目录并启动上下文，需要在模板本身被浏览器使用之前调用"""
+        await asyncio.gather(*(asyncio.to_thread(sync_profile, self.template, m.directory) for m in self._members))
+        for member in self._members:
+            member.context = await self.launch(member.directory)
+
+    async def close(self) -> None:
+        await asyncio.gather(*self._recycling, return_exceptions=True)
+        await asyncio.gather(*(self._close_member(member) for member in self._members))
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncGenerator[BrowserContext, None]:
+        """租借池中当前使用者最少的上下文"""
+        async with self._available:
+            for member in self._members:
+                if member.context is None and not member.recycling:
+                    self._start_recycle(member)  # 重新启动此前启动失败的上下文
+            await self._available.wait_for(
+                lambda: any(self._ready(m) for m in self._members) or not any(m.recycling for m in self._members)
+            )
+            if not any(self._ready(m) for m in self._members):
+                raise RuntimeError(N_("No pooled persistent context is available, all of them failed to launch."))
+            member = min((m for m in self._members if self._ready(m)), key=lambda m: (m.active, m.uses))
+            member.active += 1
+        try:
+            yield member.context  # type: ignore
+        finally:
+            member.active -= 1
+            member.uses += 1
+            if self.recycle_after is not None and member.uses >= self.recycle_after and not member.recycling:
+                # 在后台重新同步，避免阻塞归还上下文的调用方；标记需要同步进行，以免上下文在此之前被再次租借
+                self._start_recycle(member)
+            if member.recycling and member.active == 0:
+                async with self._available:
+                    self._available.notify_all()
+
+    def _ready(self, member: _Member) -> bool:
+        return member.context is not None and not member.recycling
+
+    def _start_recycle(self, member: _Member) -> None:
+        member.recycling = True
+        task = asyncio.create_task(self._recycle(member))
+        self._recycling.add(task)
+        task.add_done_callback(self._recycling.discard)
+
+    async def _close_member(self, member: _Member) -> None:
+        context, member.context = member.context, None
+        if context is None:
+            return
+        try:
+            await asyncio.wait_for(context.close(), self.close_timeout)
+        except (asyncio.TimeoutError, PWError):
+            log("warning", N_("Failed to close pooled persistent context #{index}."), index=member.index)
+
+    async def _recycle(self, member: _Member) -> None:
+        try:
+            async with self._available:
+                # 等待已经借出该上下文的租借全部归还
+                await self._available.wait_for(lambda: member.active == 0)
+            await self._close_member(member)
+            await asyncio.to_thread(sync_profile, self.template, member.directory)
+            member.context = await self.launch(member.directory)
+            member.uses = 0
+            member.recycles += 1
+        except Exception as e:
+            log(
+                "error",
+                N_("Failed to relaunch pooled persistent context #{index}: {error}"),
+                index=member.index,
+                error=str(e),
+            )
+        finally:
+            member.recycling = False
+            async with self._available:
+                self._available.notify_all()
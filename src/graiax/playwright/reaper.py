@@ -0,0 +1,126 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+from .i18n import N_
+from .utils import log
+
+
+class Reaper:
+    """在后台关闭页面与上下文的回收器
+
+    传入 `PlaywrightService` 后，`page()` / `context()` 结束时不再等待页面与上下文关闭，而是将其交给回收器，
+    由回收器在后台分批关闭，从而避免关闭操作的协议往返延迟计入调用方的耗时。
+
+    需要注意的是，录制的视频与 HAR 文件只有在页面或上下文关闭后才会写入磁盘，
+    因此开启回收器后，离开 `async with` 时这些文件可能尚未生成。
+
+    Args:
+        concurrency (int): 同时进行的关闭操作数量上限。默认为 4
+        batch_size (int): 每次从队列中取出的最大任务数量。默认为 32
+    """
+
+    def __init__(self, *, concurrency: int = 4, batch_size: int = 32) -> None:
+        if concurrency < 1 or batch_size < 1:
+            raise ValueError("concurrency and batch_size must be greater than 0")
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+
+        self.submitted: int = 0  # 提交的关闭任务数
+        self.reaped: int = 0  # 已完成的关闭任务数
+        self.peak_backlog: int = 0  # 积压量的历史峰值
+
+        self._close: Callable[[Sequence[Any]], Awaitable[None]] | None = None
+        self._queue: asyncio.Queue[Sequence[Any]] | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    @property
+    def started(self) -> bool:
+        return self._dispatcher is not None and not self._dispatcher.done()
+
+    @property
+    def backlog(self) -> int:
+        """尚未完成的关闭任务数，包括排队中与正在关闭的任务"""
+        return self.submitted - self.reaped
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """回收器的积压与吞吐计数"""
+        return {
+            "backlog": self.backlog,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._running),
+            "peak_backlog": self.peak_backlog,
+            "submitted": self.submitted,
+            "reaped": self.reaped,
+        }
+
+    def start(self, close: Callable[[Sequence[Any]], Awaitable[None]]) -> None:
+        """启动回收器
+
+        Args:
+            close (Callable[[Sequence[Any]], Awaitable[None]]): 按顺序关闭一组资源的函数
+        """
+        if self.started:
+            return
+        self._close = close
+        self._queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def submit(self, resources: Sequence[Any]) -> None:
+        """提交一组需要按顺序关闭的资源"""
+        if self._queue is None:
+            raise RuntimeError("Reaper has not been started yet")
+        self._queue.put_nowait(resources)
+        self.submitted += 1
+        self.peak_backlog = max(self.peak_backlog, self.backlog)
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """等待所有已提交的资源关闭完成
+
+        Args:
+            timeout (float | None): 最长等待时间（秒），为 None 时一直等待
+
+        Returns:
+            bool: 是否在超时前全部完成
+        """
+        if self._queue is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def stop(self) -> None:
+        """停止回收器，尚未开始的关闭任务将被丢弃"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, *self._running, return_exceptions=True)
+        self._dispatcher = None
+
+    async def _dispatch(self) -> None:
+        assert self._queue is not None and self._semaphore is not None
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            for resources in batch:
+                await self._semaphore.acquire()
+                task = asyncio.create_task(self._reap(resources))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+    async def _reap(self, resources: Sequence[Any]) -> None:
+        assert self._queue is not None and self._semaphore is not None and self._close is not None
+        try:
+            await self._close(resources)
+        except Exception as e:
+            log("error", N_("Failed to close resources in background: {error}"), error=repr(e))
+        finally:
+            self.reaped += 1
+            self._semaphore.release()
+            self._queue.task_done()
@@ -0,0 +1,81 @@
+import asyncio
+import weakref
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, Literal
+
+from playwright.async_api import BrowserContext
+
+
+class ContextRegistry:
+    """在上下文上统一安装的初始化脚本与绑定
+
+    注册的脚本与绑定按注册顺序安装到上下文上，每个上下文只会安装一次；之后注册的条目会在下一次调用 `install()` 时
+    补充安装。脚本文件只会在注册时读取一次。
+    """
+
+    def __init__(self) -> None:
+        self._entries: list[tuple[Literal["script", "binding", "function"], str, Any]] = []
+        self._names: set[str] = set()
+        self._installed: weakref.WeakKeyDictionary[BrowserContext, int] = weakref.WeakKeyDictionary()
+        self._locks: weakref.WeakKeyDictionary[BrowserContext, asyncio.Lock] = weakref.WeakKeyDictionary()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """已注册的脚本与绑定的数量"""
+        return {
+            "scripts": sum(kind == "script" for kind, _, _ in self._entries),
+            "bindings": len(self._names),
+            "contexts": len(self._installed),
+        }
+
+    def add_init_script(self, script: str | None = None, *, path: str | Path | None = None) -> None:
+        """注册一段在每个文档载入时执行的脚本
+
+        Args:
+            script (str | None): 脚本内容，与 `path` 必须且只能传入其一
+            path (str | Path | None): 脚本文件的路径
+        """
+        if (script is None) == (path is None):
+            raise ValueError("exactly one of script and path must be given")
+        if path is not None:
+            path = Path(path)
+            # 与 Playwright 相同，附加 sourceURL 以便在开发者工具中定位脚本
+            script = path.read_text(encoding="utf-8") + f"\n//# sourceURL={path.resolve()}"
+        assert script is not None
+        self._entries.append(("script", "", script))
+
+    def expose_binding(self, name: str, callback: Callable) -> None:
+        """注册一个绑定，页面中调用 `window[name]` 时，`callback` 会以调用来源及页面传入的参数调用"""
+        self._add_callable("binding", name, callback)
+
+    def expose_function(self, name: str, callback: Callable) -> None:
+        """注册一个函数，页面中调用 `window[name]` 时，`callback` 会以页面传入的参数调用"""
+        self._add_callable("function", name, callback)
+
+    def _add_callable(self, kind: Literal["binding", "function"], name: str, callback: Callable) -> None:
+        if name in self._names:
+            raise ValueError(f"binding {name!r} is already registered")
+        self._names.add(name)
+        self._entries.append((kind, name, callback))
+
+    async def install(self, context: BrowserContext) -> None:
+        """将尚未安装到 `context` 上的脚本与绑定安装到其上"""
+        if self._installed.get(context, 0) == len(self._entries):
+            return
+        # 同一上下文可能同时被多个调用方安装（例如注册新条目时），需要避免重复安装
+        async with self._locks.setdefault(context, asyncio.Lock()):
+            start = self._installed.get(context, 0)
+            for kind, name, value in self._entries[start:]:
+                if kind == "script":
+                    await context.add_init_script(value)
+                elif kind == "binding":
+                    await context.expose_binding(name, value)
+                else:
+                    await context.expose_function(name, value)
+                # 逐条记录，安装中途出错时已安装的条目不会被重复安装
+                start += 1
+                self._installed[context] = start
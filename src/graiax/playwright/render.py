@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Awaitable, Callable, Hashable, Mapping
+from typing import Any, Generic, Literal, TypeVar
+
+from playwright.async_api import Page
+
+T = TypeVar("T")
+
+WaitUntil = Literal["commit", "domcontentloaded", "load", "networkidle"]
+
+
+def fingerprint(**parts: Any) -> str:
+    """计算渲染输入（内容、上下文参数、输出选项）的指纹，无法序列化为 JSON 的值将使用其 `repr()`"""
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha256(data.encode("UTF-8")).hexdigest()
+
+
+def screenshot_options(
+    *,
+    type: Literal["jpeg", "png"] = "png",
+    quality: int | None = None,
+    omit_background: bool = False,
+    scale: Literal["css", "device"] = "device",
+) -> dict[str, Any]:
+    options: dict[str, Any] = {"type": type, "omit_background": omit_background, "scale": scale}
+    if type == "jpeg" and quality is not None:
+        options["quality"] = quality
+    return options
+
+
+async def load_page(
+    page: Page,
+    *,
+    content: str | None = None,
+    url: str | None = None,
+    wait_until: WaitUntil = "load",
+) -> None:
+    """向页面中载入 HTML 内容或导航到指定的 URL，二者必须且只能传入其一"""
+    if (content is None) == (url is None):
+        raise ValueError("exactly one of content and url must be given")
+    if url is not None:
+        await page.goto(url, wait_until=wait_until)
+    else:
+        await page.set_content(content, wait_until=wait_until)  # type: ignore
+
+
+async def render_page(
+    page: Page,
+    *,
+    content: str | None = None,
+    url: str | None = None,
+    wait_until: WaitUntil = "load",
+    selector: str | None = None,
+    full_page: bool = True,
+    options: dict[str, Any],
+) -> bytes:
+    """在给定的页面上完成一次渲染并返回截图
+
+    Args:
+        page (Page): 用于渲染的页面
+        content (str | None): 要渲染的 HTML 内容
+        url (str | None): 要渲染的 URL
+        wait_until (WaitUntil): 载入内容或导航时等待的事件
+        selector (str | None): 仅截取匹配该选择器的元素
+        full_page (bool): 是否截取整个页面，指定了 `selector` 时无效
+        options (dict[str, Any]): 由 `screenshot_options()` 生成的截图参数
+    """
+    await load_page(page, content=content, url=url, wait_until=wait_until)
+    return await capture_page(page, selector=selector, full_page=full_page, options=options)
+
+
+async def capture_page(
+    page: Page, *, selector: str | None = None, full_page: bool = True, options: dict[str, Any]
+) -> bytes:
+    """截取已载入内容的页面或其中匹配 `selector` 的元素"""
+    if selector is not None:
+        return await page.locator(selector).screenshot(**options)
+    return await page.screenshot(full_page=full_page, **options)
+
+
+_DOM_FINGERPRINT_SCRIPT = """async () => {
+    await document.fonts.ready;
+    const html = document.documentElement.outerHTML;
+    let hash = 0x811c9dc5;
+    for (let i = 0; i < html.length; i++) {
+        hash ^= html.charCodeAt(i);
+        hash = Math.imul(hash, 0x01000193);
+    }
+    const root = document.scrollingElement || document.documentElement;
+    return [(hash >>> 0).toString(16), html.length, root.scrollWidth, root.scrollHeight].join(":");
+}"""
+
+
+async def dom_fingerprint(page: Page) -> str:
+    """在页面中计算当前 DOM 与页面尺寸的指纹（FNV-1a），会等待字体载入完成
+
+    指纹只反映 DOM 与布局尺寸，Canvas 的绘制内容等不在 DOM 中的变化无法被察觉。
+    """
+    return await page.evaluate(_DOM_FINGERPRINT_SCRIPT)
+
+
+class DomFingerprintCache:
+    """按键缓存最近一次渲染的 DOM 指纹与截图，指纹未变化时可以直接复用截图
+
+    Args:
+        max_entries (int): 缓存的键的数量上限，超出时淘汰最久未使用的键。默认为 256
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self.checks: int = 0
+        self.skips: int = 0
+        self._entries: OrderedDict[Hashable, tuple[str, bytes]] = OrderedDict()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """检查次数、跳过截图的次数与跳过率"""
+        return {
+            "entries": len(self._entries),
+            "checks": self.checks,
+            "skips": self.skips,
+            "skip_rate": self.skips / self.checks if self.checks else 0.0,
+        }
+
+    def lookup(self, key: Hashable, token: str) -> bytes | None:
+        """若 `key` 上次渲染的指纹与 `token` 相同，返回上次的截图"""
+        self.checks += 1
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != token:
+            return None
+        self._entries.move_to_end(key)
+        self.skips += 1
+        return entry[1]
+
+    def store(self, key: Hashable, token: str, data: bytes) -> None:
+        self._entries[key] = (token, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def forget(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+
+_ELEMENT_BOXES_SCRIPT = """([attribute, selectors]) => {
+    const box = (element) => {
+        const rect = element.getBoundingClientRect();
+        return [rect.left + window.scrollX, rect.top + window.scrollY, rect.width, rect.height];
+    };
+    if (selectors !== null) {
+        return selectors.flatMap(([key, selector]) => {
+            const element = document.querySelector(selector);
+            return element === null ? [] : [[key, ...box(element)]];
+        });
+    }
+    return [...document.querySelectorAll(`[${attribute}]`)].map(
+        (element) => [element.getAttribute(attribute), ...box(element)]
+    );
+}"""
+
+
+async def element_clips(
+    page: Page, *, selectors: Mapping[str, str] | None = None, attribute: str = "data-capture"
+) -> list[tuple[str, dict[str, float]]]:
+    """在一次调用中获取多个元素在页面中的位置与尺寸
+
+    Args:
+        page (Page): 已载入内容的页面
+        selectors (Mapping[str, str] | None): 键到元素选择器的映射，不存在的元素会被跳过
+        attribute (str): 未传入 `selectors` 时，截取所有具有该属性的元素，并以属性值作为键。默认为 "data-capture"
+
+    Returns:
+        list[tuple[str, dict[str, float]]]: 元素的键与可以直接传给 `page.screenshot(clip=...)` 的区域，
+            宽或高为 0 的元素会被跳过
+    """
+    boxes = await page.evaluate(
+        _ELEMENT_BOXES_SCRIPT, [attribute, list(selectors.items()) if selectors is not None else None]
+    )
+    return [
+        (key, {"x": x, "y": y, "width": width, "height": height})
+        for key, x, y, width, height in boxes
+        if width > 0 and height > 0
+    ]
+
+
+async def capture_clip(page: Page, clip: dict[str, float], options: dict[str, Any]) -> bytes:
+    """截取页面中的一个区域，页面不会重新布局"""
+    # 区域以整个页面为坐标系，超出视口的部分也需要截取
+    return await page.screenshot(clip=clip, full_page=True, **options)
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[T]):
+    """合并具有相同键的并发调用
+
+    同一时刻具有相同键的调用只会真正执行一次，后到的调用者等待第一次调用的结果，
+    调用失败时异常会传递给所有等待者。所有等待者都被取消时，正在执行的调用也会被取消。
+    """
+
+    def __init__(self) -> None:
+        self.calls: int = 0  # 实际执行的调用次数
+        self.coalesced: int = 0  # 被合并的调用次数
+        self._calls: dict[str, _Call] = {}
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(factory()))
+            call.task.add_done_callback(lambda _: self._forget(key, call))  # type: ignore
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
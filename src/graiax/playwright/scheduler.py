@@ -0,0 +1,345 @@
+import asyncio
+import itertools
+import time
+import math
+from collections.abc import AsyncGenerator, Hashable
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Literal
+
+
+class Priority(IntEnum):
+    """租借的优先级，数值越大越优先"""
+
+    BULK = 0  # 批量任务，例如日报、预渲染
+    NORMAL = 1
+    INTERACTIVE = 2  # 交互式命令，可以使用预留容量
+
+
+class QuotaExceeded(RuntimeError):
+    """租户超出配额时抛出的异常
+
+    Attributes:
+        tenant (Hashable): 超出配额的租户
+        reason (Literal["rate", "queue"]): 超出的配额类型，分别对应速率限制与排队数量限制
+    """
+
+    def __init__(self, tenant: Hashable, reason: Literal["rate", "queue"]) -> None:
+        super().__init__(f"tenant {tenant!r} exceeded its {reason} quota")
+        self.tenant = tenant
+        self.reason = reason
+
+
+class TenantQuota:
+    """单个租户的配额
+
+    Args:
+        weight (float): 公平调度的权重，容量紧张时各租户获得的份额与权重成正比。默认为 1.0
+        max_concurrency (int | None): 该租户同时进行的租借数量上限，超出时排队。默认不限制
+        max_queued (int | None): 该租户排队中的请求数量上限，超出时立即抛出 `QuotaExceeded`。默认不限制
+        rate (float | None): 该租户每秒允许发起的租借数量（令牌桶），超出时立即抛出 `QuotaExceeded`。默认不限制
+        burst (int | None): 令牌桶的容量，默认与 `rate` 相同（至少为 1）
+    """
+
+    def __init__(
+        self,
+        *,
+        weight: float = 1.0,
+        max_concurrency: int | None = None,
+        max_queued: int | None = None,
+        rate: float | None = None,
+        burst: int | None = None,
+    ) -> None:
+        if weight <= 0:
+            raise ValueError("weight must be greater than 0")
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, math.ceil(rate or 1))
+
+
+class _Tenant:
+    def __init__(self, quota: TenantQuota) -> None:
+        self.quota = quota
+        self.active = 0
+        self.queued = 0
+        self.granted = 0
+        self.rejected = {"rate": 0, "queue": 0}
+        self.wait = 0.0
+        self.busy = 0.0  # 占用容量的总时间（秒）
+        self.tokens = float(quota.burst)
+        self.refilled = time.monotonic()
+        self.finish = 0.0  # 该租户最后一个请求的虚拟完成时间
+
+    def take_token(self) -> bool:
+        rate = self.quota.rate
+        if rate is None:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.quota.burst, self.tokens + (now - self.refilled) * rate)
+        self.refilled = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    @property
+    def saturated(self) -> bool:
+        limit = self.quota.max_concurrency
+        return limit is not None and self.active >= limit
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "granted": self.granted,
+            "rejected": dict(self.rejected),
+            "wait": self.wait,
+            "busy": self.busy,
+        }
+
+
+class _Waiter:
+    __slots__ = ("priority", "tenant", "enqueued", "seq", "start_tag", "future")
+
+    def __init__(self, priority: int, tenant: _Tenant, seq: int, start_tag: float, future: asyncio.Future) -> None:
+        self.priority = priority
+        self.tenant = tenant
+        self.enqueued = time.monotonic()
+        self.seq = seq
+        self.start_tag = start_tag
+        self.future = future
+
+
+class _WaitStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, wait: float) -> None:
+        self.count += 1
+        self.total += wait
+        self.max = max(self.max, wait)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "average": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+class LeaseScheduler:
+    """页面与上下文租借的优先级调度器
+
+    限制同时进行的租借数量，容量不足时按优先级排队：优先级高的请求先被满足，同一优先级内先到先得。
+    为防止低优先级请求被饿死，排队中的请求每等待 `aging` 秒，其有效优先级提升 1。
+    `reserved` 个容量仅供最高优先级（`Priority.INTERACTIVE` 及以上）使用，
+    以保证批量任务占满容量时交互式请求仍能及时响应。
+
+    租借可以指定租户（例如群号），同一优先级内各租户按加权公平队列（start-time fair queueing）轮流获得容量，
+    并受各自 `TenantQuota` 的并发与速率限制，超出速率或排队上限的请求会立即抛出 `QuotaExceeded`。
+    未指定租户的租借归入同一个不受配额限制的匿名租户。
+
+    Args:
+        capacity (int): 同时进行的租借数量上限
+        reserved (int): 为最高优先级预留的容量，必须小于 `capacity`。默认为 0
+        aging (float | None): 有效优先级提升 1 所需的等待时间（秒），为 None 时不进行老化。默认为 5.0
+        default_quota (TenantQuota | None): 未在 `quotas` 中单独指定的租户所使用的配额。默认不限制
+        quotas (dict[Hashable, TenantQuota] | None): 为特定租户单独指定的配额
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        *,
+        reserved: int = 0,
+        aging: float | None = 5.0,
+        default_quota: TenantQuota | None = None,
+        quotas: dict[Hashable, TenantQuota] | None = None,
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be greater than 0")
+        if not 0 <= reserved < capacity:
+            raise ValueError("reserved must be between 0 and capacity - 1")
+        self._capacity = capacity
+        self.reserved = reserved
+        self.aging = aging
+
+        self.in_use: int = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._wait_stats: dict[int, _WaitStats] = {}
+        self.default_quota = default_quota or TenantQuota()
+        self.quotas = quotas or {}
+        self._tenants: dict[Hashable, _Tenant] = {}
+        self._vtime = 0.0  # 公平队列的虚拟时间
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, value: int) -> None:
+        self._capacity = max(value, self.reserved + 1)
+        self._dispatch()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """容量占用与各优先级的排队等待时间（秒）"""
+        queued: dict[int, int] = {}
+        for waiter in self._waiters:
+            queued[int(waiter.priority)] = queued.get(int(waiter.priority), 0) + 1
+        return {
+            "capacity": self._capacity,
+            "reserved": self.reserved,
+            "in_use": self.in_use,
+            "queued": queued,
+            "wait": {priority: stats.as_dict() for priority, stats in sorted(self._wait_stats.items())},
+            "tenants": len(self._tenants),
+            "rejected": sum(sum(tenant.rejected.values()) for tenant in self._tenants.values()),
+        }
+
+    def usage(self, top: int | None = None) -> dict[Hashable, dict[str, Any]]:
+        """各租户的用量，按占用容量的总时间从高到低排序
+
+        Args:
+            top (int | None): 只返回用量最高的若干个租户，为 None 时返回全部
+
+        Returns:
+            dict[Hashable, dict[str, Any]]: 租户到其用量的映射，包括进行中与排队中的租借数、已获得与被拒绝的次数、
+                总排队时间与总占用时间
+        """
+        tenants = sorted(self._tenants.items(), key=lambda item: item[1].busy, reverse=True)
+        return {key: tenant.as_dict() for key, tenant in tenants[:top]}
+
+    def _tenant(self, key: Hashable | None) -> _Tenant:
+        tenant = self._tenants.get(key)
+        if tenant is None:
+            quota = TenantQuota() if key is None else self.quotas.get(key, self.default_quota)
+            tenant = self._tenants[key] = _Tenant(quota)
+        return tenant
+
+    def _tag(self, tenant: _Tenant) -> float:
+        start = max(self._vtime, tenant.finish)
+        tenant.finish = start + 1 / tenant.quota.weight
+        return start
+
+    async def acquire(self, priority: int = Priority.NORMAL, tenant: Hashable | None = None) -> float:
+        """等待一个可用容量
+
+        Args:
+            priority (int): 请求的优先级。默认为 `Priority.NORMAL`
+            tenant (Hashable | None): 请求所属的租户
+
+        Returns:
+            float: 排队等待的时间（秒）
+
+        Raises:
+            QuotaExceeded: 租户超出了速率或排队数量的配额
+        """
+        state = self._tenant(tenant)
+        if not state.take_token():
+            state.rejected["rate"] += 1
+            raise QuotaExceeded(tenant, "rate")
+
+        start = time.monotonic()
+        if not self._waiters and self._fits(priority) and not state.saturated:
+            self._vtime = self._tag(state)
+            self._grant(state)
+            self._record(priority, state, 0.0)
+            return 0.0
+
+        max_queued = state.quota.max_queued
+        if max_queued is not None and state.queued >= max_queued:
+            state.rejected["queue"] += 1
+            raise QuotaExceeded(tenant, "queue")
+
+        waiter = _Waiter(priority, state, next(self._seq), self._tag(state), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        state.queued += 1
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(tenant)
+            else:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    state.queued -= 1
+                self._dispatch()
+            raise
+        wait = time.monotonic() - start
+        self._record(priority, state, wait)
+        return wait
+
+    def release(self, tenant: Hashable | None = None) -> None:
+        """归还一个容量
+
+        Args:
+            tenant (Hashable | None): 获取该容量时所指定的租户
+        """
+        self.in_use -= 1
+        self._tenant(tenant).active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: int = Priority.NORMAL, tenant: Hashable | None = None
+    ) -> AsyncGenerator[float, None]:
+        """在 `async with` 期间占用一个容量，产出排队等待的时间（秒）"""
+        wait = await self.acquire(priority, tenant)
+        granted = time.monotonic()
+        try:
+            yield wait
+        finally:
+            self._tenant(tenant).busy += time.monotonic() - granted
+            self.release(tenant)
+
+    def _fits(self, priority: int) -> bool:
+        if priority >= Priority.INTERACTIVE:
+            return self.in_use < self._capacity
+        return self.in_use < self._capacity - self.reserved
+
+    def _effective(self, waiter: _Waiter, now: float) -> float:
+        if not self.aging:
+            return waiter.priority
+        return waiter.priority + (now - waiter.enqueued) / self.aging
+
+    def _grant(self, tenant: _Tenant) -> None:
+        self.in_use += 1
+        tenant.active += 1
+        tenant.granted += 1
+
+    def _dispatch(self) -> None:
+        while self._waiters and self.in_use < self._capacity:
+            now = time.monotonic()
+            order = sorted(self._waiters, key=lambda w: (-math.floor(self._effective(w, now)), w.start_tag, w.seq))
+            for waiter in order:
+                if waiter.future.done():
+                    # 等待者已被取消，但尚未从队列中移除
+                    self._waiters.remove(waiter)
+                    waiter.tenant.queued -= 1
+                    break
+                if self._fits(waiter.priority) and not waiter.tenant.saturated:
+                    self._waiters.remove(waiter)
+                    waiter.tenant.queued -= 1
+                    self._vtime = max(self._vtime, waiter.start_tag)
+                    self._grant(waiter.tenant)
+                    waiter.future.set_result(None)
+                    break
+            else:
+                return
+
+    def _record(self, priority: int, tenant: _Tenant, wait: float) -> None:
+        self._wait_stats.setdefault(int(priority), _WaitStats()).add(wait)
+        tenant.wait += wait
@@ -1,8 +1,13 @@
-from collections.abc import AsyncGenerator
-from contextlib import AbstractAsyncContextManager, asynccontextmanager
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Awaitable, Callable, Coroutine, Hashable, Iterable, Mapping
+from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager, nullcontext
 from pathlib import Path
 from re import Pattern
-from typing import Any, Literal, overload
+from typing import Any, Literal, TypeVar, overload
 from collections.abc import Sequence
 from warnings import warn
 
@@ -18,14 +23,51 @@ from playwright._impl._api_structures import (
 from playwright.async_api._context_manager import PlaywrightContextManager
 from playwright.async_api import Browser, BrowserContext
 from playwright.async_api import Error as PWError, BrowserType
+from playwright.async_api import TimeoutError as PWTimeoutError
 from playwright.async_api import Page, Playwright, async_playwright
-from typing_extensions import ParamSpec, Unpack
+from typing_extensions import ParamSpec, Self, Unpack
 
+from .adaptive import AdaptiveConcurrency
 from .i18n import N_
+from .image import ImagePipeline
 from .installer import install_playwright
-from .utils import Parameters, BROWSER_CONFIG_LIST, BROWSER_CONTEXT_CONFIG_LIST, log
+from .leaks import LeakDetector
+from .metrics import PerformanceCollector, RenderRecord
+from .pdf import PdfJob, print_job, print_options, style_init_script
+from .pool import PersistentContextPool
+from .reaper import Reaper
+from .registry import ContextRegistry
+from .render import (
+    DomFingerprintCache,
+    SingleFlight,
+    WaitUntil,
+    capture_clip,
+    capture_page,
+    dom_fingerprint,
+    element_clips,
+    fingerprint,
+    load_page,
+    render_page,
+    screenshot_options,
+)
+from .scheduler import LeaseScheduler, Priority
+from .stall import StallMonitor
+from .tracing import TraceSampler
+from .warmup import warm_up_context
+from .worker import WorkerPool
+from .utils import (
+    Parameters,
+    BROWSER_CONFIG_LIST,
+    BROWSER_CONTEXT_CONFIG_LIST,
+    DeadlineScope,
+    apply_page_parameters,
+    call_site,
+    log,
+    split_page_mutable,
+)
 
 P = ParamSpec("P")
+T = TypeVar("T")
 
 BROWSER_CHANNEL_TYPES = [
     "chromium",
@@ -42,10 +84,269 @@ BROWSER_CHANNEL_TYPES = [
 ]
 
 
+def _resource_kind(resource: Page | BrowserContext) -> Literal["page", "context"]:
+    return "page" if isinstance(resource, Page) else "context"
+
+
 class PlaywrightServiceStub:
     _browser: Browser | None = None
     _context: BrowserContext
     use_persistent_context: bool = False  # 指示目前是否以持久性上下文模式启动
+    use_connect_cdp: bool = False
+    cdp_use_default_context: bool = False
+    global_context_config: dict[str, Any]
+    browser_type: Literal["chromium", "firefox", "webkit"] = "chromium"
+    trace_sampler: TraceSampler | None = None
+    perf_collector: PerformanceCollector | None = None
+    render_records: deque[RenderRecord]  # 最近结束的租借的指标记录
+
+    close_timeout: float = 10.0
+    _closing: bool = False  # 服务正在关闭，不再接受新的租借
+    _drained: asyncio.Event | None = None  # 关闭服务时，在所有租借结束后被设置
+    reaper: Reaper | None = None
+    scheduler: LeaseScheduler | None = None
+    adaptive_concurrency: AdaptiveConcurrency | None = None
+    first_render_latency: float | None = None  # 启动或重启后第一次租借的耗时（秒）
+    persistent_pool: PersistentContextPool | None = None
+    leak_detector: LeakDetector | None = None
+    stall_monitor: StallMonitor | None = None
+    worker_pool: WorkerPool | None = None
+    context_registry: ContextRegistry  # 统一安装到上下文上的初始化脚本与绑定
+    _loop: asyncio.AbstractEventLoop | None = None  # 服务所在的事件循环，仅在服务运行期间可用
+    _submissions: threading.BoundedSemaphore | None = None
+    leaked: dict[str, int]  # 关闭超时而可能泄漏的资源数
+    reclaimed: dict[str, int]  # 获取过程被中断后回收的资源数
+    _cleanups: set[asyncio.Task]
+    _active_leases: dict[int, tuple[asyncio.Task | None, RenderRecord]]  # 正在进行的租借及其所在的任务
+
+    async def _new_context(self, kwargs: Parameters) -> tuple[BrowserContext]:
+        if self._browser is None:
+            raise RuntimeError(N_("Playwright has not been started yet, you cannot use the this method at this time"))
+        context = await self._browser.new_context(**kwargs)
+        try:
+            await self.context_registry.install(context)
+        except BaseException:
+            await context.close()
+            raise
+        return (context,)
+
+    def _page_overrides(self, kwargs: Parameters) -> dict[str, Any] | None:
+        if self.use_connect_cdp and self.cdp_use_default_context:
+            # 复用的默认上下文的参数未知
+            return None
+        return split_page_mutable(kwargs, self.global_context_config)
+
+    def _shared_contexts(self) -> list[BrowserContext]:
+        """全局上下文与持久性上下文池中的上下文"""
+        targets = [self._context]
+        if self.persistent_pool is not None:
+            targets += self.persistent_pool.contexts
+        return targets
+
+    @asynccontextmanager
+    async def _base_context(self, use_global_context: bool) -> AsyncGenerator[BrowserContext, None]:
+        """获取本次租借所基于的上下文：持久性上下文池中的上下文，或全局上下文"""
+        if self.persistent_pool is not None and not use_global_context:
+            async with self.persistent_pool.lease() as context:
+                yield context
+        else:
+            yield self._context
+
+    async def _new_page(
+        self,
+        record: RenderRecord,
+        base: BrowserContext,
+        use_global_context: bool,
+        without_new_context: bool,
+        kwargs: Parameters,
+    ) -> tuple[Page] | tuple[Page, BrowserContext]:
+        if self.use_persistent_context or (use_global_context and not kwargs):
+            return (self._claim(await base.new_page(), record),)
+        if use_global_context and without_new_context and (overrides := self._page_overrides(kwargs)) is not None:
+            # 仅有可在页面上直接修改的参数与全局上下文不同，直接在全局上下文中创建页面，避免创建新的上下文
+            page = self._claim(await base.new_page(), record)
+            try:
+                await apply_page_parameters(page, overrides)
+            except BaseException:
+                await page.close()
+                raise
+            return (page,)
+        if self._browser is None:
+            raise RuntimeError(N_("Playwright has not been started yet, you cannot use the this method at this time"))
+        if without_new_context and not len(self.context_registry):
+            return (await self._browser.new_page(**kwargs),)
+        # 初始化脚本只对之后创建的文档生效，需要在创建页面之前安装，因此不能使用 `browser.new_page()` 隐式创建的上下文
+        (context,) = await self._new_context(kwargs)
+        try:
+            page = await context.new_page()
+        except BaseException:
+            await context.close()
+            raise
+        return page, context
+
+    def _claim(self, page: Page, record: RenderRecord) -> Page:
+        """在共享上下文中创建页面后立即将其归属于租借，避免在此之后结束的其他租借将其视为泄漏"""
+        if self.leak_detector is not None:
+            self.leak_detector.claim((page,), record)
+        return page
+
+    async def _acquire(self, acquisition: Coroutine[Any, Any, T]) -> T:
+        """获取资源，若获取过程被取消或超时，则在其完成后回收获取到的资源"""
+        task = asyncio.ensure_future(acquisition)
+        try:
+            return await asyncio.shield(task)
+        except BaseException:
+            task.add_done_callback(self._reclaim)
+            raise
+
+    def _reclaim(self, task: asyncio.Future) -> None:
+        if task.cancelled() or task.exception() is not None:
+            return
+        resources = task.result()
+        for resource in resources:
+            self.reclaimed[_resource_kind(resource)] += 1
+        self._spawn_cleanup(resources)
+
+    def _spawn_cleanup(self, resources: Sequence[Page | BrowserContext]) -> asyncio.Task:
+        task = asyncio.create_task(self._close(resources))
+        self._cleanups.add(task)
+        task.add_done_callback(self._cleanups.discard)
+        return task
+
+    async def _release(self, resources: Sequence[Page | BrowserContext]) -> None:
+        """关闭资源，关闭过程不会因当前任务被取消而中断；启用了回收器时交由回收器在后台关闭"""
+        if self.reaper is not None and self.reaper.started:
+            self.reaper.submit(resources)
+            return
+        await asyncio.shield(self._spawn_cleanup(resources))
+
+    async def _close(self, resources: Sequence[Page | BrowserContext]) -> None:
+        for resource in resources:
+            try:
+                await asyncio.wait_for(resource.close(), self.close_timeout)
+            except asyncio.TimeoutError:
+                kind = _resource_kind(resource)
+                self.leaked[kind] += 1
+                log("warning", N_("Timed out closing {kind}, it may be leaked.").format(kind=kind))
+            except PWError:
+                pass  # 浏览器已经关闭或资源已被关闭
+
+    @asynccontextmanager
+    async def _schedule(self, record: RenderRecord) -> AsyncGenerator[None, None]:
+        """在调度器中为一次租借排队并占用容量"""
+        if self.scheduler is None:
+            yield
+            return
+        async with self.scheduler.slot(record.priority, record.tenant) as wait:
+            record.wait = wait
+            yield
+
+    @asynccontextmanager
+    async def _observe(
+        self,
+        record: RenderRecord,
+        context: BrowserContext | None = None,
+        page: Page | None = None,
+        scope: DeadlineScope | None = None,
+    ) -> AsyncGenerator[RenderRecord, None]:
+        """记录一次租借的指标，并在租借期间运行 Tracing 采样与浏览器指标采集
+
+        `context` 为 None 时（例如在渲染进程中进行的渲染）只记录耗时，不进行采样与采集。
+
+        调用方的代码结束时会立即解除 `scope` 的截止时间并完成记录，之后才等待采样与采集收尾，
+        避免已经成功的租借因收尾耗时而超时，或因收尾被取消而遗留在正在进行的租借中。
+        """
+        collector = self.perf_collector
+        probe = None
+        if page is not None and collector is not None and self.browser_type == "chromium":
+            probe = await collector.begin(page)
+        tracing = (
+            self.trace_sampler.trace(context, record)
+            if self.trace_sampler is not None and context is not None
+            else nullcontext()
+        )
+        error: BaseException | None = None
+        try:
+            async with tracing:
+                try:
+                    yield record
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    if scope is not None:
+                        scope.disarm()
+                    self._finish(record, error)
+        finally:
+            self._finish(record, error)  # 开始 Tracing 采样时出错，未能执行到调用方的代码
+            if collector is not None and probe is not None:
+                await collector.end(probe, record)
+
+    def _finish(self, record: RenderRecord, error: BaseException | None) -> None:
+        """结束一次租借的记录，重复调用不会产生影响"""
+        if record.elapsed is not None:
+            return
+        record.finish(error)
+        self.render_records.append(record)
+        self._adapt(record)
+        if self.first_render_latency is None:
+            self.first_render_latency = record.elapsed
+            log("info", N_("First render after startup took {elapsed:.3f}s."), elapsed=record.elapsed)
+
+    def _leases_of(self, task: asyncio.Task | None) -> list[RenderRecord]:
+        return [record for owner, record in list(self._active_leases.values()) if owner is task]
+
+    def _adapt(self, record: RenderRecord) -> None:
+        adaptive, scheduler = self.adaptive_concurrency, self.scheduler
+        if adaptive is None or scheduler is None or record.elapsed is None:
+            return
+        limit = adaptive.observe(
+            record.elapsed - record.wait,
+            # 调用方代码中的等待超时（例如 `wait_for_selector()`）不代表浏览器过载
+            error=isinstance(record.error, PWError) and not isinstance(record.error, PWTimeoutError),
+            saturated=scheduler.queued > 0 or scheduler.in_use >= scheduler.capacity,
+        )
+        if limit is not None:
+            scheduler.capacity = limit
+            log("info", N_("Concurrency limit adjusted to {limit}.").format(limit=scheduler.capacity))
+
+    def _record(self, kind: Literal["page", "context"], priority: int, tenant: Hashable | None) -> RenderRecord:
+        if self._closing:
+            raise RuntimeError(N_("Playwright service is shutting down, no new leases are accepted."))
+        # 获取调用栈有一定开销，仅在需要时记录
+        site = call_site() if self.leak_detector is not None or self.stall_monitor is not None else None
+        record = RenderRecord(kind, priority, tenant, site)
+        # 从此刻起即视为正在进行的租借，调用方需要在租借结束后调用 `_unregister()`
+        self._active_leases[record.id] = (asyncio.current_task(), record)
+        return record
+
+    def _unregister(self, record: RenderRecord) -> None:
+        self._active_leases.pop(record.id, None)
+        if self._drained is not None and not self._active_leases:
+            self._drained.set()
+
+    @asynccontextmanager
+    async def _detect(
+        self, record: RenderRecord, context: BrowserContext, owned: Sequence[Page | BrowserContext] = ()
+    ) -> AsyncGenerator[None, None]:
+        """跟踪租借所使用的资源，并在租借结束后检查调用方在共享上下文中创建且未关闭的页面"""
+        detector = self.leak_detector
+        if detector is None:
+            yield
+            return
+        detector.watch(context)
+        detector.claim(owned, record)
+        if context in owned or record.kind == "page":
+            # 上下文会随租借一同关闭，其中的页面不会泄漏；`page()` 租借的页面由服务创建并关闭，
+            # 不参与共享上下文的检查，否则持续的 `page()` 租借会使检查一直无法进行
+            yield
+            return
+        detector.begin(context)
+        try:
+            yield
+        finally:
+            if leftovers := detector.end(context, record):
+                await self._release(leftovers)
 
 
 class PlaywrightPageInterface(PlaywrightServiceStub):
@@ -55,6 +356,10 @@ class PlaywrightPageInterface(PlaywrightServiceStub):
         *,
         use_global_context: Literal[True] = True,
         without_new_context: Literal[True] = True,
+        timeout: float | None = None,
+        deadline: float | None = None,
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
     ) -> AbstractAsyncContextManager[Page]:
         """
         获得一个新的浏览器页面（playwright.async_api.Page），并使用全局上下文。
@@ -65,6 +370,13 @@ class PlaywrightPageInterface(PlaywrightServiceStub):
                 当你使用持久化上下文模式启动 Playwright 时，则只能使用全局上下文，也无法传入更多额外参数。
             without_new_context (Literal[True]): 是否开一个新的上下文。
                 当你使用全局上下文时，该选项无意义且必须为 True。
+            timeout (float | None): 本次租借的超时时间（秒），涵盖获取页面与使用页面的全部时间。
+                超时后会取消当前任务并抛出 `TimeoutError`，租借的资源仍会被清理
+            deadline (float | None): 本次租借的绝对截止时间，以事件循环的时钟（`loop.time()`）为准。
+                与 `timeout` 同时传入时以较早者为准
+            priority (int): 本次租借的优先级，仅在启用了调度器时生效。默认为 `Priority.NORMAL`
+            tenant (Hashable | None): 本次租借所属的租户（例如群号），仅在启用了调度器时生效。
+                调度器会在租户之间公平分配容量，超出租户配额时抛出 `QuotaExceeded`
 
         Returns:
             AbstractAsyncContextManager[Page]: 这是一个异步生成器，请参照文档使用。
@@ -87,6 +399,10 @@ class PlaywrightPageInterface(PlaywrightServiceStub):
         *,
         use_global_context: bool = True,
         without_new_context: bool = True,
+        timeout: float | None = None,
+        deadline: float | None = None,
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
         viewport: ViewportSize | None = None,
         screen: ViewportSize | None = None,
         no_viewport: bool | None = None,
@@ -131,9 +447,19 @@ class PlaywrightPageInterface(PlaywrightServiceStub):
                 当你使用持久化上下文模式启动 Playwright 时，则只能使用全局上下文，也无法传入更多额外参数。
             without_new_context (bool, optional): 是否开一个新的上下文。默认为 True。
                 即使你不使用全局上下文而是开一个新的上下文，仍然会受到 Playwright 启动参数的影响。
+            timeout (float | None): 本次租借的超时时间（秒），涵盖获取页面与使用页面的全部时间。
+                超时后会取消当前任务并抛出 `TimeoutError`，租借的资源仍会被清理
+            deadline (float | None): 本次租借的绝对截止时间，以事件循环的时钟（`loop.time()`）为准。
+                与 `timeout` 同时传入时以较早者为准
+            priority (int): 本次租借的优先级，仅在启用了调度器时生效。默认为 `Priority.NORMAL`
+            tenant (Hashable | None): 本次租借所属的租户（例如群号），仅在启用了调度器时生效。
+                调度器会在租户之间公平分配容量，超出租户配额时抛出 `QuotaExceeded`
             **kwargs: 更多参数，用法及释义请参阅：
                 - 当 `without_new_context` 为 `True` 时： <https://playwright.dev/python/docs/api/class-browser#browser-new-page>
                 - 当 `without_new_context` 为 `False` 时： <https://playwright.dev/python/docs/api/class-browser#browser-new-context>
+                若与全局上下文不同的参数均可在页面上直接修改（`viewport`、`color_scheme`、`reduced_motion`、
+                `forced_colors`、`contrast`、`extra_http_headers`），且 `use_global_context` 与
+                `without_new_context` 均为 True，则会直接在全局上下文中创建页面并应用这些参数，而不会创建新的上下文。
 
         Returns:
             AbstractAsyncContextManager[Page]: 这是一个异步生成器，请参照文档使用。
@@ -158,6 +484,10 @@ class PlaywrightPageInterface(PlaywrightServiceStub):
         *,
         use_global_context: bool = True,
         without_new_context: bool = True,
+        timeout: float | None = None,
+        deadline: float | None = None,
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
         **kwargs: Unpack[Parameters],
     ) -> AsyncGenerator[Page, None]:
         """
@@ -170,9 +500,19 @@ class PlaywrightPageInterface(PlaywrightServiceStub):
             without_new_context (Literal[True]): 是否开一个新的上下文。
                 当你使用全局上下文时，该选项无意义且必须为 True。
                 即使你不使用全局上下文而是开一个新的上下文，仍然会受到 Playwright 启动参数的影响。
+            timeout (float | None): 本次租借的超时时间（秒），涵盖获取页面与使用页面的全部时间。
+                超时后会取消当前任务并抛出 `TimeoutError`，租借的资源仍会被清理
+            deadline (float | None): 本次租借的绝对截止时间，以事件循环的时钟（`loop.time()`）为准。
+                与 `timeout` 同时传入时以较早者为准
+            priority (int): 本次租借的优先级，仅在启用了调度器时生效。默认为 `Priority.NORMAL`
+            tenant (Hashable | None): 本次租借所属的租户（例如群号），仅在启用了调度器时生效。
+                调度器会在租户之间公平分配容量，超出租户配额时抛出 `QuotaExceeded`
             **kwargs: 更多参数，用法及释义请参阅：
                 - 当 `without_new_context` 为 `True` 时： <https://playwright.dev/python/docs/api/class-browser#browser-new-page>
                 - 当 `without_new_context` 为 `False` 时： <https://playwright.dev/python/docs/api/class-browser#browser-new-context>
+                若与全局上下文不同的参数均可在页面上直接修改（`viewport`、`color_scheme`、`reduced_motion`、
+                `forced_colors`、`contrast`、`extra_http_headers`），且 `use_global_context` 与
+                `without_new_context` 均为 True，则会直接在全局上下文中创建页面并应用这些参数，而不会创建新的上下文。
 
         Returns:
             AsyncGenerator[Page, None]: 这是一个异步生成器，请参照文档使用。
@@ -189,54 +529,105 @@ class PlaywrightPageInterface(PlaywrightServiceStub):
         """
         if self._context is None:
             raise RuntimeError(N_("Playwright has not been started yet, you cannot use the this method at this time"))
-        if self.use_persistent_context and not use_global_context:
+        if self.use_persistent_context and not use_global_context and self.persistent_pool is None:
             raise RuntimeError(
                 N_("Playwright service is launched by using a persistent context. So you must use global context.")
             )
-        if self.use_persistent_context:
-            if kwargs:
-                warn(N_("`Prsistent Context` cannot accept additional parameters. Ignore it."))
-            page = await self._context.new_page()
-            try:
-                yield page
-            finally:
-                await page.close()
-                return
+        if self.use_persistent_context and kwargs:
+            warn(N_("`Prsistent Context` cannot accept additional parameters. Ignore it."))
 
-        if use_global_context and not kwargs:
-            page = await self._context.new_page()
-            try:
-                yield page
-            finally:
-                await page.close()
-                return
-
-        if self._browser is None:
-            raise RuntimeError(N_("Playwright has not been started yet, you cannot use the this method at this time"))
-        context = None
-        if without_new_context:
-            page = await self._browser.new_page(**kwargs)
-        else:
-            context = await self._browser.new_context(**kwargs)
-            page = await context.new_page()
+        record = self._record("page", priority, tenant)
         try:
-            yield page
+            with DeadlineScope(timeout=timeout, deadline=deadline) as scope:
+                async with self._schedule(record), self._base_context(use_global_context) as base:
+                    page, *owned = await self._acquire(
+                        self._new_page(record, base, use_global_context, without_new_context, kwargs)
+                    )
+                    try:
+                        async with (
+                            self._detect(record, page.context, (page, *owned)),
+                            self._observe(record, page.context, page, scope),
+                        ):
+                            yield page
+                    finally:
+                        scope.disarm()
+                        await self._release((page, *owned))
         finally:
-            await page.close()
-            if context is not None:
-                await context.close()
-            return
+            self._unregister(record)
 
 
 class PlaywrightContextInterface(PlaywrightServiceStub):
+    async def _install_registry(self) -> None:
+        """服务运行期间注册的条目需要补充安装到已有的共享上下文上"""
+        if self._loop is None:
+            return  # 服务启动时会安装所有已注册的条目
+        for context in self._shared_contexts():
+            await self.context_registry.install(context)
+
+    async def add_init_script(self, script: str | None = None, *, path: str | Path | None = None) -> None:
+        """
+        注册一段在每个文档载入时执行的脚本，它会被安装到全局上下文、持久性上下文池以及服务创建的每个上下文上，
+        无需在每个页面上调用 `page.add_init_script()`。脚本文件只会被读取一次。
+
+        在服务运行期间注册时，已经创建的非共享上下文不会被安装；渲染进程中的页面不会被安装。
+
+        Args:
+            script (str | None): 脚本内容，与 `path` 必须且只能传入其一
+            path (str | Path | None): 脚本文件的路径
+        """
+        if path is not None:
+            await asyncio.to_thread(self.context_registry.add_init_script, script, path=path)
+        else:
+            self.context_registry.add_init_script(script)
+        await self._install_registry()
+
+    async def expose_binding(self, name: str, callback: Callable) -> None:
+        """
+        注册一个绑定，安装范围与 `add_init_script()` 相同。页面中调用 `window[name]` 时，
+        `callback` 会以调用来源（包含 `context`、`page` 与 `frame`）及页面传入的参数调用。
+
+        Args:
+            name (str): 页面中的函数名
+            callback (Callable): 被调用的函数，可以是异步的
+        """
+        self.context_registry.expose_binding(name, callback)
+        await self._install_registry()
+
+    async def expose_function(self, name: str, callback: Callable) -> None:
+        """
+        注册一个函数，安装范围与 `add_init_script()` 相同。页面中调用 `window[name]` 时，
+        `callback` 会以页面传入的参数调用。
+
+        Args:
+            name (str): 页面中的函数名
+            callback (Callable): 被调用的函数，可以是异步的
+        """
+        self.context_registry.expose_function(name, callback)
+        await self._install_registry()
+
     @overload
-    def context(self, *, use_global_context: Literal[True] = True) -> AbstractAsyncContextManager[BrowserContext]:
+    def context(
+        self,
+        *,
+        use_global_context: Literal[True] = True,
+        timeout: float | None = None,
+        deadline: float | None = None,
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
+    ) -> AbstractAsyncContextManager[BrowserContext]:
         """
         获得一个新的浏览器上下文（playwright.async_api.BrowserContext）。
 
         Args:
             use_global_context (Literal[True]): 是否使用全局上下文，该选项默认为 True。
                 当你使用持久化上下文模式启动 Playwright 时，则只能使用全局上下文，也无法传入更多额外参数。
+            timeout (float | None): 本次租借的超时时间（秒），涵盖获取上下文与使用上下文的全部时间。
+                超时后会取消当前任务并抛出 `TimeoutError`，租借的资源仍会被清理
+            deadline (float | None): 本次租借的绝对截止时间，以事件循环的时钟（`loop.time()`）为准。
+                与 `timeout` 同时传入时以较早者为准
+            priority (int): 本次租借的优先级，仅在启用了调度器时生效。默认为 `Priority.NORMAL`
+            tenant (Hashable | None): 本次租借所属的租户（例如群号），仅在启用了调度器时生效。
+                调度器会在租户之间公平分配容量，超出租户配额时抛出 `QuotaExceeded`
 
         Returns:
             AbstractAsyncContextManager[BrowserContext]: 这是一个异步生成器，请参照文档使用。
@@ -247,12 +638,12 @@ class PlaywrightContextInterface(PlaywrightServiceStub):
 
             pw_service = manager.get_component(PlaywrightService)
             async with pw_service.context() as context:
-                page = context.new_page()
+                page = await context.new_page()
                 try:
                     await page.set_content("Hello World!")
                     img = await page.screenshot(type="jpeg", quality=80, full_page=True, scale='device')
                 finally:
-                    page.stop()
+                    await page.close()
             ```
         """
         ...
@@ -262,6 +653,10 @@ class PlaywrightContextInterface(PlaywrightServiceStub):
         self,
         *,
         use_global_context: Literal[False] = False,
+        timeout: float | None = None,
+        deadline: float | None = None,
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
         viewport: ViewportSize | None = None,
         screen: ViewportSize | None = None,
         no_viewport: bool | None = None,
@@ -304,6 +699,13 @@ class PlaywrightContextInterface(PlaywrightServiceStub):
             use_global_context (Literal[False]): 是否使用全局上下文，该选项默认为 True。
                 当你传入新上下文的参数时，该选项将会被忽略，将不使用全局上下文。
                 当你使用持久化上下文模式启动 Playwright 时，则只能使用全局上下文，也无法传入更多额外参数。
+            timeout (float | None): 本次租借的超时时间（秒），涵盖获取上下文与使用上下文的全部时间。
+                超时后会取消当前任务并抛出 `TimeoutError`，租借的资源仍会被清理
+            deadline (float | None): 本次租借的绝对截止时间，以事件循环的时钟（`loop.time()`）为准。
+                与 `timeout` 同时传入时以较早者为准
+            priority (int): 本次租借的优先级，仅在启用了调度器时生效。默认为 `Priority.NORMAL`
+            tenant (Hashable | None): 本次租借所属的租户（例如群号），仅在启用了调度器时生效。
+                调度器会在租户之间公平分配容量，超出租户配额时抛出 `QuotaExceeded`
             **kwargs: 更多参数，用法及释义请参阅 <https://playwright.dev/python/docs/api/class-browser#browser-new-context>
 
         Returns:
@@ -317,12 +719,12 @@ class PlaywrightContextInterface(PlaywrightServiceStub):
             async with pw_service.context(
                 viewport={"width": 300, "height": 100},
             ) as context:
-                page = context.new_page()
+                page = await context.new_page()
                 try:
                     await page.set_content("Hello World!")
                     img = await page.screenshot(type="jpeg", quality=80, full_page=True, scale='device')
                 finally:
-                    page.stop()
+                    await page.close()
             ```
         """
         ...
@@ -332,6 +734,10 @@ class PlaywrightContextInterface(PlaywrightServiceStub):
         self,
         *,
         use_global_context: bool = True,
+        timeout: float | None = None,
+        deadline: float | None = None,
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
         **kwargs: Unpack[Parameters],
     ) -> AsyncGenerator[BrowserContext, None]:
         """
@@ -341,6 +747,13 @@ class PlaywrightContextInterface(PlaywrightServiceStub):
             use_global_context (Literal[False]): 是否使用全局上下文，该选项默认为 True。
                 当你传入新上下文的参数时，该选项将会被忽略，将不使用全局上下文。
                 当你使用持久化上下文模式启动 Playwright 时，则只能使用全局上下文，也无法传入更多额外参数。
+            timeout (float | None): 本次租借的超时时间（秒），涵盖获取上下文与使用上下文的全部时间。
+                超时后会取消当前任务并抛出 `TimeoutError`，租借的资源仍会被清理
+            deadline (float | None): 本次租借的绝对截止时间，以事件循环的时钟（`loop.time()`）为准。
+                与 `timeout` 同时传入时以较早者为准
+            priority (int): 本次租借的优先级，仅在启用了调度器时生效。默认为 `Priority.NORMAL`
+            tenant (Hashable | None): 本次租借所属的租户（例如群号），仅在启用了调度器时生效。
+                调度器会在租户之间公平分配容量，超出租户配额时抛出 `QuotaExceeded`
             **kwargs: 更多参数，用法及释义请参阅 <https://playwright.dev/python/docs/api/class-browser#browser-new-context>
 
         Returns:
@@ -352,42 +765,574 @@ class PlaywrightContextInterface(PlaywrightServiceStub):
 
             pw_service = manager.get_component(PlaywrightService)
             async with pw_service.context(...) as context:
-                page = context.new_page()
+                page = await context.new_page()
                 try:
                     await page.set_content("Hello World!")
                     img = await page.screenshot(type="jpeg", quality=80, full_page=True, scale='device')
                 finally:
-                    page.stop()
+                    await page.close()
             ```
         """
         if self._context is None:
             raise RuntimeError(N_("Playwright has not been started yet, you cannot use the this method at this time"))
-        if self.use_persistent_context and not use_global_context:
+        if self.use_persistent_context and not use_global_context and self.persistent_pool is None:
             raise RuntimeError(
                 N_("Playwright service is launched by using a persistent context. So you must use global context.")
             )
-        if self.use_persistent_context:
-            if kwargs:
-                warn(N_("`Prsistent Context` cannot accept additional parameters. Ignore it."))
-            yield self._context
-            return
+        if self.use_persistent_context and kwargs:
+            warn(N_("`Prsistent Context` cannot accept additional parameters. Ignore it."))
 
-        if self._browser is None:
+        record = self._record("context", priority, tenant)
+        try:
+            with DeadlineScope(timeout=timeout, deadline=deadline) as scope:
+                async with self._schedule(record), self._base_context(use_global_context) as base:
+                    if self.use_persistent_context or (use_global_context and not kwargs):
+                        async with self._detect(record, base), self._observe(record, base, scope=scope):
+                            yield base
+                        return
+
+                    (context,) = await self._acquire(self._new_context(kwargs))
+                    try:
+                        async with (
+                            self._detect(record, context, (context,)),
+                            self._observe(record, context, scope=scope),
+                        ):
+                            yield context
+                    finally:
+                        scope.disarm()
+                        await self._release((context,))
+        finally:
+            self._unregister(record)
+
+
+class PlaywrightRenderInterface(PlaywrightPageInterface):
+    render_flights: SingleFlight[bytes]
+    dom_cache: DomFingerprintCache
+    image_pipeline: ImagePipeline | None = None
+
+    async def render(
+        self,
+        content: str | None = None,
+        *,
+        url: str | None = None,
+        wait_until: WaitUntil = "load",
+        selector: str | None = None,
+        full_page: bool = True,
+        type: Literal["jpeg", "png"] = "png",
+        quality: int | None = None,
+        omit_background: bool = False,
+        scale: Literal["css", "device"] = "device",
+        coalesce: bool = True,
+        pipeline: ImagePipeline | None = None,
+        fingerprint_key: Hashable | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
+        **kwargs: Unpack[Parameters],
+    ) -> bytes:
+        """
+        渲染一段 HTML 或一个 URL 并返回截图。
+
+        同一时刻输入（内容、上下文参数、截图参数）完全相同的渲染只会进行一次，后到的调用者将直接等待第一次渲染的结果，
+        渲染失败时所有等待者都会收到同一个异常。启用了渲染进程时，渲染会在渲染进程中进行。
+
+        Args:
+            content (str | None): 要渲染的 HTML 内容，与 `url` 必须且只能传入其一
+            url (str | None): 要渲染的 URL
+            wait_until (WaitUntil): 载入内容或导航时等待的事件。默认为 "load"
+            selector (str | None): 仅截取匹配该选择器的元素
+            full_page (bool): 是否截取整个页面，指定了 `selector` 时无效。默认为 True
+            type (Literal["jpeg", "png"]): 截图格式。默认为 "png"
+            quality (int | None): JPEG 截图的质量
+            omit_background (bool): 是否隐藏默认的白色背景。默认为 False
+            scale (Literal["css", "device"]): 截图的缩放方式。默认为 "device"
+            coalesce (bool): 是否合并相同输入的并发渲染。默认为 True
+            pipeline (ImagePipeline | None): 截图的后处理流水线，为 None 时使用创建服务时传入的 `image_pipeline`
+            fingerprint_key (Hashable | None): 传入时，在页面载入后计算 DOM 指纹，若与该键上次渲染时的指纹
+                （及截图参数）相同，则跳过截图与后处理，直接返回上次的结果，适用于定期重新渲染变化不频繁的 URL。
+                此时渲染不会在渲染进程中进行
+            timeout (float | None): 本次渲染的超时时间（秒），超时后抛出 `TimeoutError`
+            deadline (float | None): 本次渲染的绝对截止时间，以事件循环的时钟（`loop.time()`）为准
+            priority (int): 渲染所用页面的租借优先级。默认为 `Priority.NORMAL`
+            tenant (Hashable | None): 渲染所用页面的租借所属的租户
+            **kwargs: 新上下文或新页面的参数，与 `page()` 相同
+
+        Returns:
+            bytes: 截图数据
+
+        Usage:
+            ```python
+            from graiax.playwright import PlaywrightService
+
+            pw_service = manager.get_component(PlaywrightService)
+            img = await pw_service.render("<h1>Hello World!</h1>", type="jpeg", quality=80)
+            # 仪表盘未变化时不会重新截图
+            img = await pw_service.render(url="https://example.com/dashboard", fingerprint_key="dashboard")
+            ```
+        """
+        return await self._render(
+            pipeline or self.image_pipeline,
+            content=content,
+            url=url,
+            wait_until=wait_until,
+            selector=selector,
+            full_page=full_page,
+            options=screenshot_options(type=type, quality=quality, omit_background=omit_background, scale=scale),
+            coalesce=coalesce,
+            fingerprint_key=fingerprint_key,
+            timeout=timeout,
+            deadline=deadline,
+            priority=priority,
+            tenant=tenant,
+            parameters=kwargs,
+        )
+
+    async def render_tiles(
+        self,
+        content: str | None = None,
+        *,
+        url: str | None = None,
+        wait_until: WaitUntil = "load",
+        selector: str | None = None,
+        full_page: bool = True,
+        type: Literal["jpeg", "png"] = "png",
+        quality: int | None = None,
+        omit_background: bool = False,
+        scale: Literal["css", "device"] = "device",
+        coalesce: bool = True,
+        pipeline: ImagePipeline | None = None,
+        fingerprint_key: Hashable | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
+        **kwargs: Unpack[Parameters],
+    ) -> list[bytes]:
+        """
+        与 `render()` 相同，但截图会经过后处理流水线的 `process_tiles()`，按其 `tile_height` 纵向切分为多张，
+        适用于超出聊天平台图片尺寸限制的超长截图。参数与 `render()` 相同。
+
+        Returns:
+            list[bytes]: 切分后的图片，截图高度不超过 `tile_height` 时只有一张
+
+        Usage:
+            ```python
+            from graiax.playwright import ImagePipeline, PlaywrightService
+
+            pw_service = manager.get_component(PlaywrightService)
+            tiles = await pw_service.render_tiles(html, pipeline=ImagePipeline(tile_height=4000))
+            ```
+        """
+        post = pipeline or self.image_pipeline
+        if post is None:
+            raise ValueError("render_tiles() requires an image pipeline")
+        # 合并渲染与 DOM 指纹缓存的均为未经处理的截图，切分在之后进行
+        data = await self._render(
+            None,
+            content=content,
+            url=url,
+            wait_until=wait_until,
+            selector=selector,
+            full_page=full_page,
+            options=screenshot_options(type=type, quality=quality, omit_background=omit_background, scale=scale),
+            coalesce=coalesce,
+            fingerprint_key=fingerprint_key,
+            timeout=timeout,
+            deadline=deadline,
+            priority=priority,
+            tenant=tenant,
+            parameters=kwargs,
+        )
+        return await post.process_tiles(data)
+
+    async def _render(
+        self,
+        post: ImagePipeline | None,
+        *,
+        content: str | None,
+        url: str | None,
+        wait_until: WaitUntil,
+        selector: str | None,
+        full_page: bool,
+        options: dict[str, Any],
+        coalesce: bool,
+        fingerprint_key: Hashable | None,
+        timeout: float | None,
+        deadline: float | None,
+        priority: int,
+        tenant: Hashable | None,
+        parameters: Parameters,
+    ) -> bytes:
+        async def shoot() -> bytes:
+            if self.worker_pool is not None:
+                record = self._record("page", priority, tenant)
+                try:
+                    async with self._schedule(record), self._observe(record):
+                        return await self.worker_pool.render(
+                            content=content,
+                            url=url,
+                            wait_until=wait_until,
+                            selector=selector,
+                            full_page=full_page,
+                            options=options,
+                            parameters=dict(parameters),
+                        )
+                finally:
+                    self._unregister(record)
+            async with self.page(priority=priority, tenant=tenant, **parameters) as page:
+                return await render_page(
+                    page,
+                    content=content,
+                    url=url,
+                    wait_until=wait_until,
+                    selector=selector,
+                    full_page=full_page,
+                    options=options,
+                )
+
+        async def shoot_if_changed(key: Hashable) -> bytes:
+            async with self.page(priority=priority, tenant=tenant, **parameters) as page:
+                await load_page(page, content=content, url=url, wait_until=wait_until)
+                token = f"{await dom_fingerprint(page)}:{settings}"
+                if (cached := self.dom_cache.lookup(key, token)) is not None:
+                    return cached
+                data = await capture_page(page, selector=selector, full_page=full_page, options=options)
+            if post is not None:
+                data = await post.process(data)
+            self.dom_cache.store(key, token, data)
+            return data
+
+        async def run() -> bytes:
+            if fingerprint_key is not None:
+                return await shoot_if_changed(fingerprint_key)
+            data = await shoot()
+            # 后处理在页面归还之后进行，不占用页面与调度容量
+            return data if post is None else await post.process(data)
+
+        # 截图参数不同时，即使 DOM 未变化也不能复用上次的截图
+        settings = fingerprint(
+            selector=selector, full_page=full_page, options=options, parameters=parameters, pipeline=post
+        )
+        with DeadlineScope(timeout=timeout, deadline=deadline):
+            if not coalesce:
+                return await run()
+            key = fingerprint(
+                content=content,
+                url=url,
+                wait_until=wait_until,
+                settings=settings,
+                fingerprint_key=fingerprint_key,
+            )
+            return await self.render_flights.do(key, run)
+
+    async def render_elements(
+        self,
+        content: str | None = None,
+        *,
+        url: str | None = None,
+        wait_until: WaitUntil = "load",
+        selectors: Mapping[str, str] | None = None,
+        attribute: str = "data-capture",
+        type: Literal["jpeg", "png"] = "png",
+        quality: int | None = None,
+        omit_background: bool = False,
+        scale: Literal["css", "device"] = "device",
+        pipeline: ImagePipeline | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
+        priority: int = Priority.NORMAL,
+        tenant: Hashable | None = None,
+        **kwargs: Unpack[Parameters],
+    ) -> AsyncGenerator[tuple[str, bytes], None]:
+        """
+        渲染一段包含多个元素的 HTML 或一个 URL，并分别截取其中的每个元素。
+
+        所有元素在同一个页面中只布局一次，每截取一个元素即产出一个，适合代替为每个元素单独渲染一个页面。
+
+        Args:
+            content (str | None): 要渲染的 HTML 内容，与 `url` 必须且只能传入其一
+            url (str | None): 要渲染的 URL
+            wait_until (WaitUntil): 载入内容或导航时等待的事件。默认为 "load"
+            selectors (Mapping[str, str] | None): 键到元素选择器的映射，不存在的元素会被跳过
+            attribute (str): 未传入 `selectors` 时，截取所有具有该属性的元素，并以属性值作为键。默认为 "data-capture"
+            type (Literal["jpeg", "png"]): 截图格式。默认为 "png"
+            quality (int | None): JPEG 截图的质量
+            omit_background (bool): 是否隐藏默认的白色背景。默认为 False
+            scale (Literal["css", "device"]): 截图的缩放方式。默认为 "device"
+            pipeline (ImagePipeline | None): 截图的后处理流水线，为 None 时使用创建服务时传入的 `image_pipeline`
+            timeout (float | None): 超时时间（秒），涵盖获取页面、载入内容与全部元素的截取。截止时间只在这些步骤中生效，
+                不会在产出元素、由调用方处理时触发，但调用方处理元素所花费的时间同样计算在内
+            deadline (float | None): 绝对截止时间，以事件循环的时钟（`loop.time()`）为准
+            priority (int): 渲染所用页面的租借优先级。默认为 `Priority.NORMAL`
+            tenant (Hashable | None): 渲染所用页面的租借所属的租户
+            **kwargs: 新上下文或新页面的参数，与 `page()` 相同
+
+        Returns:
+            AsyncGenerator[tuple[str, bytes], None]: 依次产出元素的键与截图，提前结束迭代时请使用
+                `contextlib.aclosing()` 以及时归还页面
+
+        Usage:
+            ```python
+            from graiax.playwright import PlaywrightService
+
+            pw_service = manager.get_component(PlaywrightService)
+            html = "".join(f'<div class="card" data-capture="{user.id}">...</div>' for user in users)
+            async for user_id, img in pw_service.render_elements(html):
+                ...
+            ```
+        """
+        options = screenshot_options(type=type, quality=quality, omit_background=omit_background, scale=scale)
+        post = pipeline or self.image_pipeline
+        if timeout is not None:
+            when = asyncio.get_running_loop().time() + timeout
+            deadline = when if deadline is None else min(deadline, when)
+        # 截止时间不能跨越 `yield`，否则会在调用方处理元素时取消调用方，因此分别应用于每个步骤
+        async with AsyncExitStack() as stack:
+            with DeadlineScope(deadline=deadline):
+                page = await stack.enter_async_context(self.page(priority=priority, tenant=tenant, **kwargs))
+                await load_page(page, content=content, url=url, wait_until=wait_until)
+                clips = await element_clips(page, selectors=selectors, attribute=attribute)
+            for key, clip in clips:
+                with DeadlineScope(deadline=deadline):
+                    data = await capture_clip(page, clip, options)
+                    if post is not None:
+                        data = await post.process(data)
+                yield key, data
+
+
+class PlaywrightPdfInterface(PlaywrightPageInterface):
+    async def render_pdfs(
+        self,
+        jobs: Iterable[PdfJob],
+        *,
+        concurrency: int = 4,
+        css: str | None = None,
+        format: str | None = "A4",
+        width: str | float | None = None,
+        height: str | float | None = None,
+        landscape: bool = False,
+        scale: float = 1.0,
+        print_background: bool = True,
+        margin: dict[str, str | float] | None = None,
+        header_template: str | None = None,
+        footer_template: str | None = None,
+        page_ranges: str | None = None,
+        prefer_css_page_size: bool = False,
+        return_exceptions: bool = False,
+        priority: int = Priority.BULK,
+        tenant: Hashable | None = None,
+        **kwargs: Unpack[Parameters],
+    ) -> list[int | BaseException]:
+        """
+        批量生成 PDF，仅支持 Chromium。
+
+        会租借 `concurrency` 个页面并在所有 PDF 之间复用，共享的 CSS 在每个页面上只注册一次，
+        页眉、页脚与纸张参数对所有 PDF 相同。PDF 会分块写入各自的输出，而不会在内存中保留整个文档。
+
+        Args:
+            jobs (Iterable[PdfJob]): 需要生成的 PDF
+            concurrency (int): 同时使用的页面数量。默认为 4
+            css (str | None): 所有 PDF 共享的 CSS
+            format (str | None): 纸张格式，为 None 时使用 `width` 与 `height`。默认为 "A4"
+            width (str | float | None): 纸张宽度，数字的单位为像素，字符串可以带有 px、in、cm 或 mm 单位
+            height (str | float | None): 纸张高度
+            landscape (bool): 是否横向打印。默认为 False
+            scale (float): 网页内容的缩放比例。默认为 1.0
+            print_background (bool): 是否打印背景。默认为 True
+            margin (dict[str, str | float] | None): 页边距，可包含 top、right、bottom、left
+            header_template (str | None): 页眉的 HTML 模板，详见
+                <https://playwright.dev/python/docs/api/class-page#page-pdf>
+            footer_template (str | None): 页脚的 HTML 模板
+            page_ranges (str | None): 打印的页码范围，例如 "1-5, 8"
+            prefer_css_page_size (bool): 是否优先使用 CSS `@page` 规则中声明的纸张尺寸。默认为 False
+            return_exceptions (bool): 为 True 时单个 PDF 生成失败不会中断其他 PDF，而是将异常放在结果中。默认为 False
+            priority (int): 页面的租借优先级。默认为 `Priority.BULK`
+            tenant (Hashable | None): 页面的租借所属的租户
+            **kwargs: 新页面的参数，与 `page()` 相同
+
+        Returns:
+            list[int | BaseException]: 与 `jobs` 一一对应的写入字节数，或 `return_exceptions` 为 True 时的异常
+
+        Usage:
+            ```python
+            from graiax.playwright import PdfJob, PlaywrightService
+
+            pw_service = manager.get_component(PlaywrightService)
+            await pw_service.render_pdfs(
+                [PdfJob(f"reports/{name}.pdf", content=html) for name, html in reports.items()],
+                css=REPORT_CSS,
+                footer_template='<div style="font-size: 8px"><span class="pageNumber"></span></div>',
+            )
+            ```
+        """
+        if self.browser_type != "chromium":
+            raise RuntimeError(N_("PDF generation is only supported by Chromium."))
+        params = print_options(
+            format=format,
+            width=width,
+            height=height,
+            landscape=landscape,
+            scale=scale,
+            print_background=print_background,
+            margin=margin,
+            header_template=header_template,
+            footer_template=footer_template,
+            page_ranges=page_ranges,
+            prefer_css_page_size=prefer_css_page_size,
+        )
+        pending = list(enumerate(jobs))
+        results: list[int | BaseException] = [0] * len(pending)
+        queue = iter(pending)  # 各页面从同一个迭代器中领取任务
+
+        async def work() -> None:
+            async with self.page(priority=priority, tenant=tenant, **kwargs) as page:
+                if css is not None:
+                    await page.add_init_script(style_init_script(css))
+                for index, job in queue:
+                    try:
+                        results[index] = await print_job(page, job, params, css=css)
+                    except Exception as e:
+                        if not return_exceptions:
+                            raise
+                        results[index] = e
+
+        tasks = [asyncio.create_task(work()) for _ in range(min(concurrency, len(pending)))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return results
+
+
+class PlaywrightSubmitInterface(PlaywrightServiceStub):
+    def _submit(self, job: Callable[[Self], Awaitable[T]] | Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+        loop = self._loop
+        if loop is None:
+            if asyncio.iscoroutine(job):
+                job.close()
             raise RuntimeError(N_("Playwright has not been started yet, you cannot use the this method at this time"))
 
-        if use_global_context and not kwargs:
-            yield self._context
-            return
+        async def run() -> T:
+            return await (job if asyncio.iscoroutine(job) else job(self))  # type: ignore
 
-        context = await self._browser.new_context(**kwargs)
+        future = asyncio.run_coroutine_threadsafe(run(), loop)
+        if self._submissions is not None:
+            future.add_done_callback(lambda _: self._submissions.release())  # type: ignore
+        return future
+
+    def _check_thread(self) -> None:
         try:
-            yield context
-        finally:
-            await context.close()
+            running = asyncio.get_running_loop()
+        except RuntimeError:
             return
+        if running is self._loop:
+            raise RuntimeError(N_("submit() cannot be used in the event loop of the service, use page() or render()."))
+
+    def submit(
+        self,
+        job: Callable[[Self], Awaitable[T]] | Coroutine[Any, Any, T],
+        *,
+        timeout: float | None = None,
+    ) -> concurrent.futures.Future[T]:
+        """
+        从任意线程向服务所在的事件循环提交一个任务。
+
+        任务可以是一个接受服务本身作为参数并返回可等待对象的函数，也可以是一个尚未开始执行的协程。
+        任务会在服务所在的事件循环中执行，因此可以在其中使用 `page()`、`context()` 与 `render()`。
+        取消返回的 Future 会取消服务事件循环中正在执行的任务。
+
+        同时提交的任务数量达到 `max_pending_submissions` 时，本方法会阻塞当前线程直到有任务完成。
+
+        Args:
+            job (Callable[[Self], Awaitable[T]] | Coroutine[Any, Any, T]): 要提交的任务
+            timeout (float | None): 等待提交的最长时间（秒），为 None 时一直等待
+
+        Returns:
+            concurrent.futures.Future[T]: 任务的结果
+
+        Raises:
+            TimeoutError: 在 `timeout` 内未能提交任务
+
+        Usage:
+            ```python
+            from graiax.playwright import PlaywrightService
+
+            pw_service = manager.get_component(PlaywrightService)
+
+            def worker():  # 在其他线程中
+                future = pw_service.submit(lambda service: service.render("<h1>Hello World!</h1>"))
+                img = future.result()
+            ```
+        """
+        self._check_thread()
+        submissions = self._submissions
+        if submissions is not None and not submissions.acquire(timeout=timeout):
+            if asyncio.iscoroutine(job):
+                job.close()
+            raise TimeoutError(N_("Timed out waiting for a submission slot."))
+        try:
+            return self._submit(job)
+        except BaseException:
+            if submissions is not None:
+                submissions.release()
+            raise
+
+    async def submit_async(
+        self,
+        job: Callable[[Self], Awaitable[T]] | Coroutine[Any, Any, T],
+        *,
+        timeout: float | None = None,
+    ) -> T:
+        """
+        从其他事件循环向服务所在的事件循环提交一个任务并等待其结果。
+
+        与 `submit()` 相同，但等待提交与等待结果时均不会阻塞调用方的事件循环；
+        取消对本方法的等待会取消服务事件循环中正在执行的任务。
+
+        Args:
+            job (Callable[[Self], Awaitable[T]] | Coroutine[Any, Any, T]): 要提交的任务
+            timeout (float | None): 等待提交的最长时间（秒），为 None 时一直等待
+
+        Returns:
+            T: 任务的结果
+
+        Raises:
+            TimeoutError: 在 `timeout` 内未能提交任务
+        """
+        self._check_thread()
+        submissions = self._submissions
+        if submissions is not None and not submissions.acquire(blocking=False):
+            acquisition = asyncio.ensure_future(asyncio.to_thread(submissions.acquire, timeout=timeout))
+            try:
+                acquired = await asyncio.shield(acquisition)
+            except BaseException:
+                # 线程中的等待无法被中断，获取成功后需要归还
+                acquisition.add_done_callback(
+                    lambda task: submissions.release() if not task.cancelled() and task.result() else None
+                )
+                if asyncio.iscoroutine(job):
+                    job.close()
+                raise
+            if not acquired:
+                if asyncio.iscoroutine(job):
+                    job.close()
+                raise TimeoutError(N_("Timed out waiting for a submission slot."))
+        try:
+            future = self._submit(job)
+        except BaseException:
+            if submissions is not None:
+                submissions.release()
+            raise
+        return await asyncio.wrap_future(future)
 
 
-class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInterface):
+class PlaywrightService(
+    Service, PlaywrightRenderInterface, PlaywrightPdfInterface, PlaywrightContextInterface, PlaywrightSubmitInterface
+):
     """用于 launart 的浏览器服务
 
     Args:
@@ -399,6 +1344,38 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
             sudo 或管理员权限
         user_data_dir: (str | Path | None): 用户数据储存目录。传入该参数且不为 None 时，使用持久性上下文模式启动
             Playwright，此时将不可通过 `PlaywrightBrowser` 接口获取浏览器实例
+        trace_sampler (TraceSampler | None): 尾部采样的 Tracing，传入时会对 `page()` 与 `context()` 的租借进行采样，
+            仅保存慢渲染或出错时的 Trace
+        perf_collector (PerformanceCollector | None): 浏览器性能指标采集器，传入时会在 `page()` 租借的开始与结束时
+            通过 CDP 采集页面的布局、脚本等指标，仅支持 Chromium
+        image_pipeline (ImagePipeline | None): `render()` 默认使用的截图后处理流水线，需要安装 Pillow
+        close_timeout (float): 关闭页面或上下文的超时时间（秒），超时的资源会被计为泄漏。关闭服务时也作为
+            每个关闭步骤的超时时间。默认为 10.0
+        shutdown_timeout (float): 关闭服务时等待正在进行的租借结束的最长时间（秒）。默认为 30.0
+        reaper (Reaper | None): 后台回收器，传入时 `page()` / `context()` 结束时不再等待资源关闭，
+            而是交由回收器在后台关闭
+        scheduler (LeaseScheduler | None): 租借调度器，传入时将限制同时进行的租借数量，并按优先级排队
+        adaptive_concurrency (AdaptiveConcurrency | None): 根据租借耗时与浏览器错误自动调整调度器的容量，
+            未传入 `scheduler` 时会自动创建一个
+        leak_detector (LeakDetector | None): 泄漏检测器，传入时会跟踪服务所使用的上下文与其中的页面，
+            并检查调用方在 `context()` 租借的上下文中创建、租借结束后仍未关闭的页面
+        stall_monitor (StallMonitor | None): 事件循环卡顿监视器，传入时会统计事件循环的延迟，
+            并在卡顿时记录卡顿的任务中正在进行的租借及发起租借的代码位置
+        max_pending_submissions (int | None): 通过 `submit()` / `submit_async()` 提交且尚未完成的任务数量上限，
+            达到上限时提交方会等待。默认不限制
+        persistent_pool_size (int): 持久性上下文模式下额外启动的持久性上下文数量。大于 0 时，会将 `user_data_dir`
+            作为模板复制出相应数量的用户数据目录并分别启动，`page()` / `context()` 在 `use_global_context=False`
+            时将使用这些上下文，从而实现并发渲染。默认为 0
+        persistent_recycle_after (int | None): 池中的持久性上下文被租借多少次后从模板重新同步用户数据目录，
+            为 None 时不重新同步
+        warmup (Sequence[str] | None): 在 `preparing` 阶段结束前预先渲染一次的 HTML 或 URL，用于提前载入模板资源
+        warmup_fonts (Sequence[str] | None): 在 `preparing` 阶段结束前预先载入的字体名称，会使用该字体渲染包含 CJK
+            字符的样例文本
+        render_workers (int): 渲染进程的数量。大于 0 时会启动相应数量的子进程，每个子进程拥有各自的 Playwright 驱动
+            与浏览器，`render()` 将在这些子进程中执行，以利用多个 CPU 核心。仅支持启动新浏览器的模式。
+            子进程以 spawn 方式启动，会重新导入主模块，因此启动 Launart 的代码必须放在 `if __name__ == "__main__":` 中。
+            默认为 0
+        render_worker_concurrency (int): 每个渲染进程同时进行的渲染数量上限。默认为 4
         **kwargs: 详见 <https://playwright.dev/python/docs/api/class-browsertype#browser-type-launch>
     """
 
@@ -423,6 +1400,20 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
         expose_network: str | None = None,
         timeout: float | None = None,
         slow_mo: float | None = None,
+        # 扩展功能
+        trace_sampler: TraceSampler | None = None,
+        perf_collector: PerformanceCollector | None = None,
+        image_pipeline: ImagePipeline | None = None,
+        close_timeout: float = 10.0,
+        shutdown_timeout: float = 30.0,
+        reaper: Reaper | None = None,
+        scheduler: LeaseScheduler | None = None,
+        adaptive_concurrency: AdaptiveConcurrency | None = None,
+        leak_detector: LeakDetector | None = None,
+        stall_monitor: StallMonitor | None = None,
+        max_pending_submissions: int | None = None,
+        warmup: Sequence[str] | None = None,
+        warmup_fonts: Sequence[str] | None = None,
         # BROWSER_CONTEXT_CONFIG_LIST
         viewport: ViewportSize | None = None,
         screen: ViewportSize | None = None,
@@ -475,6 +1466,20 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
         expose_network: str | None = None,
         timeout: float | None = None,
         slow_mo: float | None = None,
+        # 扩展功能
+        trace_sampler: TraceSampler | None = None,
+        perf_collector: PerformanceCollector | None = None,
+        image_pipeline: ImagePipeline | None = None,
+        close_timeout: float = 10.0,
+        shutdown_timeout: float = 30.0,
+        reaper: Reaper | None = None,
+        scheduler: LeaseScheduler | None = None,
+        adaptive_concurrency: AdaptiveConcurrency | None = None,
+        leak_detector: LeakDetector | None = None,
+        stall_monitor: StallMonitor | None = None,
+        max_pending_submissions: int | None = None,
+        warmup: Sequence[str] | None = None,
+        warmup_fonts: Sequence[str] | None = None,
         # BROWSER_CONTEXT_CONFIG_LIST
         viewport: ViewportSize | None = None,
         screen: ViewportSize | None = None,
@@ -525,6 +1530,22 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
         auto_download_browser: bool = True,
         playwright_download_host: str | None = None,
         install_with_deps: bool = False,
+        # 扩展功能
+        trace_sampler: TraceSampler | None = None,
+        perf_collector: PerformanceCollector | None = None,
+        image_pipeline: ImagePipeline | None = None,
+        close_timeout: float = 10.0,
+        shutdown_timeout: float = 30.0,
+        reaper: Reaper | None = None,
+        scheduler: LeaseScheduler | None = None,
+        adaptive_concurrency: AdaptiveConcurrency | None = None,
+        leak_detector: LeakDetector | None = None,
+        stall_monitor: StallMonitor | None = None,
+        max_pending_submissions: int | None = None,
+        warmup: Sequence[str] | None = None,
+        warmup_fonts: Sequence[str] | None = None,
+        render_workers: int = 0,
+        render_worker_concurrency: int = 4,
         user_data_dir: None = None,  # `launch_persistent_context` flag
         # BROWSER_CONFIG_LIST
         executable_path: str | Path | None = None,
@@ -592,7 +1613,23 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
         auto_download_browser: bool = True,
         playwright_download_host: str | None = None,
         install_with_deps: bool = False,
+        # 扩展功能
+        trace_sampler: TraceSampler | None = None,
+        perf_collector: PerformanceCollector | None = None,
+        image_pipeline: ImagePipeline | None = None,
+        close_timeout: float = 10.0,
+        shutdown_timeout: float = 30.0,
+        reaper: Reaper | None = None,
+        scheduler: LeaseScheduler | None = None,
+        adaptive_concurrency: AdaptiveConcurrency | None = None,
+        leak_detector: LeakDetector | None = None,
+        stall_monitor: StallMonitor | None = None,
+        max_pending_submissions: int | None = None,
+        warmup: Sequence[str] | None = None,
+        warmup_fonts: Sequence[str] | None = None,
         user_data_dir: str | Path,  # `launch_persistent_context` flag
+        persistent_pool_size: int = 0,
+        persistent_recycle_after: int | None = None,
         # PERSISTENT_CONTEXT_CONFIG_LIST
         channel: str | None = None,
         executable_path: Path | str | None = None,
@@ -653,12 +1690,65 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
         auto_download_browser: bool = True,
         playwright_download_host: str | None = None,
         install_with_deps: bool = False,
+        trace_sampler: TraceSampler | None = None,
+        perf_collector: PerformanceCollector | None = None,
+        image_pipeline: ImagePipeline | None = None,
+        close_timeout: float = 10.0,
+        shutdown_timeout: float = 30.0,
+        reaper: Reaper | None = None,
+        scheduler: LeaseScheduler | None = None,
+        adaptive_concurrency: AdaptiveConcurrency | None = None,
+        leak_detector: LeakDetector | None = None,
+        stall_monitor: StallMonitor | None = None,
+        max_pending_submissions: int | None = None,
+        warmup: Sequence[str] | None = None,
+        warmup_fonts: Sequence[str] | None = None,
+        persistent_pool_size: int = 0,
+        persistent_recycle_after: int | None = None,
+        render_workers: int = 0,
+        render_worker_concurrency: int = 4,
         **kwargs,
     ) -> None:
         self.browser_type: Literal["chromium", "firefox", "webkit"] = browser_type
         self.auto_download_browser = auto_download_browser
         self.playwright_download_host = playwright_download_host
         self.install_with_deps = install_with_deps
+        self.trace_sampler = trace_sampler
+        self.perf_collector = perf_collector
+        self.image_pipeline = image_pipeline
+        self.render_records = deque(maxlen=128)
+        self.close_timeout = close_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.shutdown_timings: dict[str, float] = {}
+        self.reaper = reaper
+        self.scheduler = scheduler
+        self.adaptive_concurrency = adaptive_concurrency
+        if adaptive_concurrency is not None:
+            if self.scheduler is None:
+                self.scheduler = LeaseScheduler(adaptive_concurrency.limit)
+            else:
+                self.scheduler.capacity = adaptive_concurrency.limit
+        self.leak_detector = leak_detector
+        self.stall_monitor = stall_monitor
+        self.max_pending_submissions = max_pending_submissions
+        if max_pending_submissions is not None:
+            self._submissions = threading.BoundedSemaphore(max_pending_submissions)
+        self.render_flights = SingleFlight()
+        self.context_registry = ContextRegistry()
+        self.dom_cache = DomFingerprintCache()
+        self.warmup = warmup or ()
+        self.warmup_fonts = warmup_fonts or ()
+        self.warmup_timings: dict[str, float] = {}
+        self.persistent_pool_size = persistent_pool_size
+        self.persistent_recycle_after = persistent_recycle_after
+        self.render_workers = render_workers
+        self.render_worker_concurrency = render_worker_concurrency
+        self.leaked = {"page": 0, "context": 0}
+        self.reclaimed = {"page": 0, "context": 0}
+        self._cleanups = set()
+        self._active_leases = {}
+        self.launch_config = {}
+        self.global_context_config = {}
         self.use_persistent_context = False
         self.use_connect = False
         self.use_connect_cdp = False
@@ -673,6 +1763,11 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
         elif "user_data_dir" in kwargs and kwargs["user_data_dir"] is not None:
             self.use_persistent_context = True
 
+        if render_workers > 0:
+            assert not (
+                self.use_connect or self.use_connect_cdp or self.use_persistent_context
+            ), "render_workers only supports launching a new browser"
+
         if "channel" in kwargs and kwargs["channel"] is not None:
             assert kwargs["channel"] in BROWSER_CHANNEL_TYPES, "channel must be one of " + ", ".join(
                 BROWSER_CHANNEL_TYPES
@@ -711,6 +1806,41 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
 
         super().__init__()
 
+    @property
+    def stats(self) -> dict[str, Any]:
+        """服务的运行统计"""
+        stats: dict[str, Any] = {
+            "leaked": dict(self.leaked),
+            "reclaimed": dict(self.reclaimed),
+            "cleanups": len(self._cleanups),
+        }
+        if self.trace_sampler is not None:
+            stats["tracing"] = self.trace_sampler.stats
+        if self.perf_collector is not None:
+            stats["performance"] = self.perf_collector.stats
+        if self.reaper is not None:
+            stats["reaper"] = self.reaper.stats
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.stats
+        if self.adaptive_concurrency is not None:
+            stats["adaptive_concurrency"] = self.adaptive_concurrency.stats
+        if self.leak_detector is not None:
+            stats["leaks"] = self.leak_detector.stats
+        if self.stall_monitor is not None:
+            stats["stalls"] = self.stall_monitor.stats
+        stats["render"] = self.render_flights.stats
+        stats["dom_fingerprint"] = self.dom_cache.stats
+        if self.persistent_pool is not None:
+            stats["persistent_pool"] = self.persistent_pool.stats
+        if self.worker_pool is not None:
+            stats["workers"] = self.worker_pool.stats
+        if self.image_pipeline is not None:
+            stats["image_pipeline"] = self.image_pipeline.stats
+        if len(self.context_registry):
+            stats["context_registry"] = self.context_registry.stats
+        stats["first_render_latency"] = self.first_render_latency
+        return stats
+
     @property
     def required(self):
         return set()
@@ -733,10 +1863,45 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
                 self._context = await self._browser.new_context(**self.global_context_config)
         elif self.use_persistent_context:
             log("info", N_("Playwright is currently starting in persistent context mode."))
+            if self.persistent_pool_size > 0:
+                if self.persistent_pool is not None:
+                    # 重启时先关闭旧的池并等待其后台的重新同步结束，避免其写入新池正在复制的目录
+                    await self.persistent_pool.close()
+                # 需要在模板被浏览器占用前复制用户数据目录
+                self.persistent_pool = PersistentContextPool(
+                    Path(self.launch_config["user_data_dir"]),
+                    self.persistent_pool_size,
+                    lambda path: self._launch_pool_member(browser_type, path),
+                    recycle_after=self.persistent_recycle_after,
+                    close_timeout=self.close_timeout,
+                )
+                await self.persistent_pool.start()
             self._context = await browser_type.launch_persistent_context(**self.launch_config)
         else:
             self._browser = await browser_type.launch(**self.launch_config)
             self._context = await self._browser.new_context(**self.global_context_config)
+        for context in self._shared_contexts():
+            await self.context_registry.install(context)
+        if self.leak_detector is not None:
+            for context in self._shared_contexts():
+                self.leak_detector.watch(context)
+
+    async def _launch_pool_member(self, browser_type: BrowserType, path: Path) -> BrowserContext:
+        context = await browser_type.launch_persistent_context(**{**self.launch_config, "user_data_dir": path})
+        try:
+            await self.context_registry.install(context)
+        except BaseException:
+            await context.close()
+            raise
+        return context
+
+    async def _warm_up(self) -> None:
+        if not self.warmup and not self.warmup_fonts:
+            return
+        start = time.perf_counter()
+        for context in self._shared_contexts():
+            self.warmup_timings.update(await warm_up_context(context, self.warmup, self.warmup_fonts))
+        log("success", N_("Warm-up finished in {elapsed:.3f}s.").format(elapsed=time.perf_counter() - start))
 
     async def launch(self, m: Launart):
         if self.auto_download_browser:
@@ -802,12 +1967,96 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
                         N_("Playwright for {browser_type} is started.").format(browser_type=self.browser_type),
                     )
 
+            await self._warm_up()
+            if self.reaper is not None:
+                self.reaper.start(self._close)
+            if self.render_workers > 0:
+                self.worker_pool = WorkerPool(
+                    self.render_workers,
+                    self.browser_type,
+                    self.launch_config,
+                    self.global_context_config,
+                    concurrency=self.render_worker_concurrency,
+                )
+                await self.worker_pool.start()
+                log("success", N_("{count} render workers are started.").format(count=self.render_workers))
+            self._loop = asyncio.get_running_loop()
+            if self.stall_monitor is not None:
+                self.stall_monitor.start(self._leases_of)
+
         async with self.stage("blocking"):
             await m.status.wait_for_sigexit()
 
         async with self.stage("cleanup"):
-            # await self.context.close()  # 这里会卡住
-            await self.playwright_mgr.__aexit__()
+            await self._shutdown()
+
+    async def _drain_leases(self) -> bool:
+        """等待正在进行（包括在调度器中排队与正在获取资源）的租借结束，返回是否在 `shutdown_timeout` 内全部结束"""
+
+        async def idle() -> None:
+            while self._active_leases:
+                self._drained = asyncio.Event()
+                await self._drained.wait()
+
+        try:
+            await asyncio.wait_for(idle(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _shutdown_step(self, name: str, step: Awaitable[Any]) -> None:
+        """执行一个关闭步骤并记录耗时，超时或出错时放弃该步骤并继续关闭"""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(step, self.close_timeout)
+        except asyncio.TimeoutError:
+            log("warning", N_("Shutdown step {step} timed out, skipped."), step=name)
+        except PWError as e:
+            log("warning", N_("Shutdown step {step} failed: {error}"), step=name, error=str(e))
+        self.shutdown_timings[name] = time.perf_counter() - start
+
+    async def _shutdown(self) -> None:
+        """停止接受新的租借，等待正在进行的租借结束，再依次关闭上下文、浏览器与 Playwright"""
+        start = time.perf_counter()
+        self._closing = True
+        self._loop = None  # 不再接受新提交的任务
+        if not await self._drain_leases():
+            log(
+                "warning",
+                N_("{count} leases did not finish in {timeout}s, closing anyway.").format(
+                    count=len(self._active_leases), timeout=self.shutdown_timeout
+                ),
+            )
+        self.shutdown_timings["drain"] = time.perf_counter() - start
+        if self.stall_monitor is not None:
+            await self.stall_monitor.stop()
+        if self.reaper is not None:
+            if not await self.reaper.drain(self.close_timeout):
+                log(
+                    "warning",
+                    N_("Reaper did not finish in time, {count} close operations are dropped.").format(
+                        count=self.reaper.backlog
+                    ),
+                )
+            await self.reaper.stop()
+        if self.persistent_pool is not None:
+            await self._shutdown_step("persistent_pool", self.persistent_pool.close())
+        if self.worker_pool is not None:
+            await self._shutdown_step("workers", self.worker_pool.close(self.close_timeout))
+        if not (self.use_connect_cdp and self.cdp_use_default_context):
+            # 复用的默认上下文属于外部浏览器，不应由服务关闭
+            await self._shutdown_step("context", self._context.close())
+        if self._browser is not None:
+            await self._shutdown_step("browser", self._browser.close())
+        await self._shutdown_step("playwright", self.playwright_mgr.__aexit__())
+        elapsed = time.perf_counter() - start
+        log(
+            "info",
+            N_("Playwright service shut down in {elapsed:.3f}s ({timings}).").format(
+                elapsed=elapsed,
+                timings=", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.shutdown_timings.items()),
+            ),
+        )
 
     async def restart(self):
         """重启 Playwright 浏览器"""
@@ -834,3 +2083,5 @@ class PlaywrightService(Service, PlaywrightPageInterface, PlaywrightContextInter
             raise
         else:
             log("success", N_("Playwright for {browser_type} is restarted.").format(browser_type=self.browser_type))
+        self.first_render_latency = None
+        await self._warm_up()
@@ -0,0 +1,174 @@
+import asyncio
+import bisect
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from .i18n import N_
+from .metrics import RenderRecord
+from .utils import log
+
+DEFAULT_STALL_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class StallReport:
+    """一次事件循环卡顿的记录
+
+    Attributes:
+        duration (float | None): 卡顿持续的时间（秒），卡顿尚未结束时为 None
+        task (str | None): 卡顿时正在运行的任务名称
+        stack (list[str]): 卡顿时事件循环线程的调用栈
+        leases (list[RenderRecord]): 卡顿的任务中正在进行的租借
+    """
+
+    __slots__ = ("duration", "task", "stack", "leases")
+
+    def __init__(self, task: str | None, stack: list[str], leases: list[RenderRecord]) -> None:
+        self.duration: float | None = None
+        self.task = task
+        self.stack = stack
+        self.leases = leases
+
+    def __repr__(self) -> str:
+        return f"<StallReport duration={self.duration} task={self.task!r} leases={[r.id for r in self.leases]}>"
+
+
+class StallMonitor:
+    """事件循环卡顿监视器
+
+    在事件循环中以 `interval` 为间隔运行心跳，统计每次心跳的延迟；另有一个监视线程在心跳超过 `threshold` 未更新时
+    采样事件循环线程的调用栈与当前任务，并找出该任务中正在进行的 `page()` / `context()` 租借及发起租借的代码位置，
+    用于定位在租借期间执行了同步阻塞操作的调用方。
+
+    Args:
+        interval (float): 心跳间隔（秒）。默认为 0.01
+        threshold (float): 视为卡顿的延迟（秒）。默认为 0.1
+        buckets (Sequence[float]): 延迟直方图的桶上界（秒）
+        max_reports (int): 保留的卡顿记录数量。默认为 50
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.01,
+        threshold: float = 0.1,
+        buckets: Sequence[float] = DEFAULT_STALL_BUCKETS,
+        max_reports: int = 50,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.buckets = tuple(sorted(buckets))
+        self.reports: deque[StallReport] = deque(maxlen=max_reports)
+
+        self.samples: int = 0
+        self.stalls: int = 0
+        self.max_lag: float = 0.0
+        self._histogram = [0] * (len(self.buckets) + 1)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread_id: int | None = None
+        self._leases: Callable[[asyncio.Task | None], list[RenderRecord]] = lambda _: []
+        self._beat = 0.0
+        self._sampled = 0.0
+        self._pending: StallReport | None = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """心跳次数、卡顿次数与延迟直方图（秒）"""
+        labels = [f"<={bound:g}" for bound in self.buckets] + ["+Inf"]
+        return {
+            "samples": self.samples,
+            "stalls": self.stalls,
+            "max_lag": self.max_lag,
+            "histogram": dict(zip(labels, self._histogram)),
+        }
+
+    def start(self, leases: Callable[[asyncio.Task | None], list[RenderRecord]]) -> None:
+        """在当前事件循环中启动监视器
+
+        Args:
+            leases (Callable[[asyncio.Task | None], list[RenderRecord]]): 返回指定任务中正在进行的租借的函数，
+                会在监视线程中调用
+        """
+        if self._heartbeat is not None and not self._heartbeat.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._leases = leases
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="graiax-playwright-stall-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self.samples += 1
+            self.max_lag = max(self.max_lag, lag)
+            self._histogram[bisect.bisect_left(self.buckets, lag)] += 1
+            with self._lock:
+                report, self._pending = self._pending, None
+            if lag >= self.threshold:
+                self.stalls += 1
+                if report is not None:
+                    report.duration = lag
+                    self.reports.append(report)
+                    try:
+                        self._log(report)
+                    except Exception:
+                        pass  # 日志输出失败不应使心跳停止
+
+    def _watch(self) -> None:
+        assert self._loop is not None and self._thread_id is not None
+        while not self._stopped.wait(self.interval):
+            beat = self._beat
+            if time.monotonic() - beat < self.threshold or self._sampled == beat:
+                continue
+            self._sampled = beat  # 每次卡顿只采样一次
+            frame = sys._current_frames().get(self._thread_id)
+            stack = traceback.format_stack(frame) if frame is not None else []
+            task = asyncio.current_task(self._loop)
+            try:
+                leases = self._leases(task)
+            except RuntimeError:
+                leases = []  # 事件循环线程恰好在修改租借记录
+            with self._lock:
+                self._pending = StallReport(task.get_name() if task is not None else None, stack, leases)
+
+    def _log(self, report: StallReport) -> None:
+        location = report.stack[-1].strip().splitlines()[0] if report.stack else "?"
+        if report.leases:
+            culprit = ", ".join(
+                N_("lease #{id} acquired at {site}").format(id=record.id, site=record.site) for record in report.leases
+            )
+        else:
+            culprit = N_("no active lease")
+        log(
+            "warning",
+            N_("Event loop stalled for {duration:.3f}s at {location} in task {task} ({culprit})."),
+            duration=report.duration,
+            location=location,
+            task=report.task,
+            culprit=culprit,
+        )
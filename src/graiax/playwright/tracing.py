@@ -0,0 +1,178 @@
+import asyncio
+import random
+import time
+from collections import deque
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from playwright.async_api import BrowserContext
+from playwright.async_api import Error as PWError
+
+from .i18n import N_
+from .metrics import RenderRecord
+from .utils import log
+
+
+class TraceSampler:
+    """尾部采样的 Playwright Tracing
+
+    按 `sample_rate` 的概率在租借的页面或上下文上开启轻量级的 Tracing，仅当该次租借耗时超过 `threshold`
+    或抛出异常时才将 Trace 保存到磁盘，否则直接丢弃。保存的 Trace 文件数量不会超过 `max_files`，
+    超出时删除最旧的文件。
+
+    Playwright 的 Tracing 以上下文为单位，同一上下文同时只能有一个 Tracing，因此当多个页面同时使用全局上下文时，
+    仅有其中一次租借会被采样，且其 Trace 中会包含同时期其他页面的活动。
+
+    Args:
+        directory (str | Path): Trace 文件的保存目录，不存在时会自动创建
+        threshold (float): 慢渲染阈值（秒），耗时超过该值的租借会保存 Trace。默认为 1.0
+        sample_rate (float): 开启 Tracing 的概率，取值范围为 0 ~ 1。Tracing 会拖慢渲染，不宜对所有租借开启。默认为 0.01
+        max_files (int): 最多保留的 Trace 文件数量。默认为 20
+        screenshots (bool): Trace 中是否包含截图，开启后开销较大。默认为 False
+        snapshots (bool): Trace 中是否包含 DOM 快照。默认为 True
+        sources (bool): Trace 中是否包含源码。默认为 False
+
+    Usage:
+        ```python
+        from graiax.playwright import PlaywrightService, TraceSampler
+
+        sampler = TraceSampler("traces", threshold=2.0, sample_rate=0.1)
+        launart.add_component(PlaywrightService("chromium", trace_sampler=sampler))
+        ...
+        print(sampler.stats)
+        ```
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        threshold: float = 1.0,
+        sample_rate: float = 0.01,
+        max_files: int = 20,
+        screenshots: bool = False,
+        snapshots: bool = True,
+        sources: bool = False,
+    ) -> None:
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if max_files < 1:
+            raise ValueError("max_files must be greater than 0")
+        self.directory = Path(directory)
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.screenshots = screenshots
+        self.snapshots = snapshots
+        self.sources = sources
+
+        self.sampled: int = 0  # 开启了 Tracing 的租借数
+        self.skipped: int = 0  # 未被采样或因上下文已在 Tracing 中而跳过的租借数
+        self.kept: int = 0  # 保存了 Trace 的租借数
+        self.discarded: int = 0  # 丢弃了 Trace 的租借数
+        self.failed: int = 0  # 开启或保存 Trace 失败的次数
+        self.overhead: float = 0.0  # 开启与结束 Tracing 所花费的总时间（秒）
+
+        self._tracing: set[BrowserContext] = set()
+        self._stopping: set[asyncio.Task] = set()
+        self._seq = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._files: deque[Path] = deque(sorted(self.directory.glob("trace-*.zip"), key=lambda p: p.stat().st_mtime))
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        """采样与开销计数"""
+        return {
+            "sample_rate": self.sample_rate,
+            "sampled": self.sampled,
+            "skipped": self.skipped,
+            "kept": self.kept,
+            "discarded": self.discarded,
+            "failed": self.failed,
+            "overhead": self.overhead,
+            "files": len(self._files),
+        }
+
+    @asynccontextmanager
+    async def trace(self, context: BrowserContext, record: RenderRecord | None = None) -> AsyncGenerator[None, None]:
+        """在一次租借期间对指定的上下文进行采样
+
+        Args:
+            context (BrowserContext): 要采样的浏览器上下文
+            record (RenderRecord | None): 本次租借的指标记录，保存 Trace 时会写入其 `trace` 属性
+        """
+        if not await self._start(context):
+            yield
+            return
+
+        start = time.perf_counter()
+        error: BaseException | None = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # 结束采样不会因当前任务被再次取消而中断，否则上下文会一直处于采样中，之后的采样都会失败
+            stopping = asyncio.create_task(self._stop(context, time.perf_counter() - start, error))
+            self._stopping.add(stopping)
+            stopping.add_done_callback(self._stopping.discard)
+            path = await asyncio.shield(stopping)
+            if record is not None:
+                record.trace = path
+
+    async def _start(self, context: BrowserContext) -> bool:
+        if context in self._tracing or random.random() >= self.sample_rate:
+            self.skipped += 1
+            return False
+
+        self._tracing.add(context)
+        start = time.perf_counter()
+        try:
+            await context.tracing.start(screenshots=self.screenshots, snapshots=self.snapshots, sources=self.sources)
+        except PWError as e:
+            self._tracing.discard(context)
+            self.failed += 1
+            log("warning", N_("Failed to start tracing: {error}"), error=str(e))
+            return False
+        finally:
+            self.overhead += time.perf_counter() - start
+        self.sampled += 1
+        return True
+
+    async def _stop(self, context: BrowserContext, elapsed: float, error: BaseException | None) -> Path | None:
+        start = time.perf_counter()
+        path = None
+        try:
+            if error is None and elapsed < self.threshold:
+                await context.tracing.stop()
+                self.discarded += 1
+            else:
+                path = self._next_path("error" if error is not None else "slow")
+                await context.tracing.stop(path=path)
+                self._keep(path)
+                log(
+                    "warning",
+                    N_("Render took {elapsed:.3f}s, trace saved to [magenta]{path}[/]"),
+                    elapsed=elapsed,
+                    path=str(path),
+                )
+        except PWError as e:
+            path = None
+            self.failed += 1
+            log("warning", N_("Failed to save trace: {error}"), error=str(e))
+        finally:
+            self._tracing.discard(context)
+            self.overhead += time.perf_counter() - start
+        return path
+
+    def _next_path(self, reason: str) -> Path:
+        self._seq += 1
+        return self.directory / f"trace-{time.strftime('%Y%m%d-%H%M%S')}-{self._seq:06d}-{reason}.zip"
+
+    def _keep(self, path: Path) -> None:
+        self.kept += 1
+        self._files.append(path)
+        while len(self._files) > self.max_files:
+            self._files.popleft().unlink(missing_ok=True)
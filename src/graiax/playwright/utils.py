@@ -1,7 +1,10 @@
+import asyncio
+import contextlib
+import sys
 from pathlib import Path
 from re import Pattern
-from typing import Literal
-from collections.abc import Sequence
+from typing import Any, Literal
+from collections.abc import Iterable, Mapping, Sequence
 
 from loguru import logger
 from playwright._impl._api_structures import (
@@ -12,16 +15,96 @@ from playwright._impl._api_structures import (
     ViewportSize,
     ClientCertificate,
 )
+from playwright.async_api import Page
 from typing_extensions import TypedDict
 
 
-def log(level: str, rich_text: str) -> None:
+def log(level: str, rich_text: str, **fields: Any) -> None:
+    """输出日志
+
+    `rich_text` 中的 `[tag]` 会被视为颜色标记。URL、错误信息等动态内容需要通过 `fields` 填入 `rich_text` 中的占位符，
+    其中的 `<`、`[` 等字符不会被视为标记。
+    """
+    plain = {key: value.replace("[", "\\[") if isinstance(value, str) else value for key, value in fields.items()}
     getattr(logger.opt(colors=True), level)(
         rich_text.replace("[", "<").replace("]", ">"),
-        alt=rich_text,
+        alt=rich_text.format(**plain),
+        **fields,
     )
 
 
+class DeadlineScope:
+    """在到达截止时间时取消当前任务，并将由此产生的 `asyncio.CancelledError` 转换为 `TimeoutError`
+
+    Args:
+        timeout (float | None): 从进入作用域开始计算的超时时间（秒）
+        deadline (float | None): 绝对截止时间，以事件循环的时钟（`loop.time()`）为准。
+            与 `timeout` 同时传入时以较早者为准
+    """
+
+    def __init__(self, *, timeout: float | None = None, deadline: float | None = None) -> None:
+        self.timeout = timeout
+        self.deadline = deadline
+        self.expired = False
+        self._task: asyncio.Task | None = None
+        self._cancelling = 0  # 进入作用域时任务已被请求取消的次数
+        self._handle: asyncio.TimerHandle | None = None
+
+    def __enter__(self):
+        loop = asyncio.get_running_loop()
+        if self.timeout is not None:
+            when = loop.time() + self.timeout
+            self.deadline = when if self.deadline is None else min(self.deadline, when)
+        if self.deadline is None:
+            return self
+        if self.deadline <= loop.time():
+            self.expired = True
+            raise TimeoutError
+        self._task = asyncio.current_task()
+        if self._task is not None and hasattr(self._task, "cancelling"):
+            self._cancelling = self._task.cancelling()
+        self._handle = loop.call_at(self.deadline, self._expire)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.disarm()
+        if self.expired and exc_type is not None and issubclass(exc_type, asyncio.CancelledError):
+            # 与 `asyncio.timeout()` 相同，任务同时被外部取消时保留 `CancelledError`（需要 Python 3.11+）
+            if self._task is not None and hasattr(self._task, "uncancel"):
+                if self._task.uncancel() > self._cancelling:
+                    return
+            raise TimeoutError from exc
+
+    def _expire(self) -> None:
+        self.expired = True
+        if self._task is not None:
+            self._task.cancel()
+
+    def disarm(self) -> None:
+        """取消计时，之后不会再因截止时间而取消当前任务"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    @property
+    def remaining(self) -> float | None:
+        """距离截止时间的剩余秒数，未设置截止时间时为 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - asyncio.get_running_loop().time())
+
+
+_SKIPPED_FILES = (str(Path(__file__).parent), str(Path(contextlib.__file__)))
+
+
+def call_site() -> str:
+    """获取调用本库的代码位置（跳过本库与 `contextlib` 内部的栈帧），格式为 `文件:行号 in 函数名`"""
+    frame = sys._getframe(1)
+    while frame.f_back is not None and frame.f_code.co_filename.startswith(_SKIPPED_FILES):
+        frame = frame.f_back
+    return f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
 class Progress:
     def __init__(self, name: str) -> None:
         self.last_updated: float = 0
@@ -105,6 +188,46 @@ BROWSER_CONTEXT_CONFIG_LIST = [
 ]
 
 
+# 可以在已有页面上直接修改的上下文参数
+PAGE_MUTABLE_CONFIG_LIST = [
+    "viewport",
+    "color_scheme",
+    "reduced_motion",
+    "forced_colors",
+    "contrast",
+    "extra_http_headers",
+]
+
+MEDIA_CONFIG_LIST = ["color_scheme", "reduced_motion", "forced_colors", "contrast"]
+
+
+def split_page_mutable(parameters: Mapping[str, Any], baseline: Mapping[str, Any]) -> dict[str, Any] | None:
+    """找出与 `baseline` 不同的参数，若它们都可以在已有页面上直接修改则返回这些参数，否则返回 None
+
+    未在 `parameters` 中传入而 `baseline` 中设置了的参数同样视为不同，因为新上下文会使用 Playwright 的默认值。
+
+    Args:
+        parameters (Mapping[str, Any]): 新页面的参数
+        baseline (Mapping[str, Any]): 页面所在上下文的参数
+    """
+    changed = {k: parameters.get(k) for k in {*parameters, *baseline} if parameters.get(k) != baseline.get(k)}
+    if "extra_http_headers" in changed and baseline.get("extra_http_headers"):
+        return None  # 页面上设置的请求头会与上下文的请求头合并，无法替换
+    if all(k in PAGE_MUTABLE_CONFIG_LIST and v is not None for k, v in changed.items()):
+        return changed
+    return None
+
+
+async def apply_page_parameters(page: Page, parameters: Mapping[str, Any]) -> None:
+    """在已有页面上应用可直接修改的参数"""
+    if "viewport" in parameters:
+        await page.set_viewport_size(parameters["viewport"])
+    if media := {k: v for k, v in parameters.items() if k in MEDIA_CONFIG_LIST}:
+        await page.emulate_media(**media)
+    if "extra_http_headers" in parameters:
+        await page.set_extra_http_headers(parameters["extra_http_headers"])
+
+
 class Parameters(TypedDict, total=False):
     viewport: ViewportSize | None
     screen: ViewportSize | None
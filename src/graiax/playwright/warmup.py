@@ -0,0 +1,72 @@
+import html
+import time
+from collections.abc import Sequence
+
+from playwright.async_api import BrowserContext
+from playwright.async_api import Error as PWError
+
+from .i18n import N_
+from .render import load_page
+from .utils import log
+
+FONT_SAMPLE = (
+    "The quick brown fox jumps over the lazy dog. 0123456789 "
+    "永和九年，岁在癸丑，暮春之初，会于会稽山阴之兰亭。"
+    "いろはにほへと ちりぬるを 다람쥐 헌 쳇바퀴에 타고파"
+)
+
+
+def font_html(family: str) -> str:
+    """生成使用指定字体渲染常规、粗体与斜体样例文本的 HTML"""
+    family = html.escape(family, quote=True)
+    sample = html.escape(FONT_SAMPLE)
+    return (
+        f"<html><body style=\"font-family: '{family}'\">"
+        f"<p>{sample}</p><p><b>{sample}</b></p><p><i>{sample}</i></p>"
+        "</body></html>"
+    )
+
+
+def _is_url(item: str) -> bool:
+    return item.startswith(("http://", "https://", "file://", "data:"))
+
+
+async def warm_up_context(
+    context: BrowserContext,
+    items: Sequence[str] = (),
+    fonts: Sequence[str] = (),
+) -> dict[str, float]:
+    """在指定的上下文中依次渲染字体样例与给定的 HTML / URL 一次，使字体、字形表与模板资源提前载入
+
+    单个项目失败时仅记录警告，不影响其他项目。
+
+    Args:
+        context (BrowserContext): 需要预热的上下文
+        items (Sequence[str]): 需要预先渲染的 HTML 或 URL（以 `http://`、`https://`、`file://` 或 `data:` 开头）
+        fonts (Sequence[str]): 需要预先载入的字体名称
+
+    Returns:
+        dict[str, float]: 每个项目的预热耗时（秒）
+    """
+    timings: dict[str, float] = {}
+    page = await context.new_page()
+    try:
+        jobs = [(f"font:{family}", font_html(family), False) for family in fonts]
+        jobs += [(item if _is_url(item) else f"html#{i}", item, _is_url(item)) for i, item in enumerate(items)]
+        for label, item, is_url in jobs:
+            start = time.perf_counter()
+            try:
+                if is_url:
+                    await load_page(page, url=item)
+                else:
+                    await load_page(page, content=item)
+                await page.evaluate("document.fonts.ready.then(() => undefined)")
+                await page.screenshot(full_page=True)
+            except PWError as e:
+                log("warning", N_("Failed to warm up {item}: {error}"), item=label, error=e.message)
+                continue
+            timings[label] = time.perf_counter() - start
+            log("info", N_("Warmed up {item} in {elapsed:.3f}s"), item=label, elapsed=timings[label])
+    finally:
+        await page.close()
+    return timings
@@ -0,0 +1,276 @@
+import asyncio
+import itertools
+import multiprocessing
+import signal
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Any, Literal
+
+from playwright.async_api import async_playwright
+
+from .i18n import N_
+from .render import WaitUntil, render_page
+from .utils import log
+
+
+class WorkerError(RuntimeError):
+    """渲染进程中的渲染失败或渲染进程意外退出时抛出的异常"""
+
+
+def _worker_main(
+    conn: Connection,
+    browser_type: Literal["chromium", "firefox", "webkit"],
+    launch_config: dict[str, Any],
+    context_config: dict[str, Any],
+    concurrency: int,
+) -> None:
+    # 终端的 Ctrl+C 会发送给整个进程组，渲染进程（及其启动的驱动与浏览器）忽略它，由主进程在清理阶段负责关闭
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(conn, browser_type, launch_config, context_config, concurrency))
+
+
+async def _serve(
+    conn: Connection,
+    browser_type: Literal["chromium", "firefox", "webkit"],
+    launch_config: dict[str, Any],
+    context_config: dict[str, Any],
+    concurrency: int,
+) -> None:
+    async with async_playwright() as playwright:
+        browser = await getattr(playwright, browser_type).launch(**launch_config)
+        context = await browser.new_context(**context_config)
+        semaphore = asyncio.Semaphore(concurrency)
+        running: set[asyncio.Task] = set()
+
+        async def handle(job_id: int, job: dict[str, Any]) -> None:
+            async with semaphore:
+                parameters = job.pop("parameters")
+                try:
+                    page = await (browser.new_page(**parameters) if parameters else context.new_page())
+                    try:
+                        data = await render_page(page, **job)
+                    finally:
+                        await page.close()
+                except Exception as e:
+                    conn.send((job_id, "error", f"{type(e).__name__}: {e}"))
+                    return
+            # 截图数据经由共享内存传回主进程，由主进程负责释放
+            segment = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+            segment.buf[: len(data)] = data
+            conn.send((job_id, "ok", (segment.name, len(data))))
+            segment.close()
+
+        conn.send((None, "ready", None))
+        while True:
+            try:
+                message = await asyncio.to_thread(conn.recv)
+            except EOFError:
+                break
+            if message is None:
+                break
+            task = asyncio.create_task(handle(*message))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        await asyncio.gather(*running, return_exceptions=True)
+        await browser.close()
+
+
+class _Worker:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.process: multiprocessing.process.BaseProcess | None = None
+        self.conn: Connection | None = None
+        self.ready: asyncio.Future[None] | None = None
+        self.pending: dict[int, asyncio.Future[bytes]] = {}
+        self.rendered = 0
+        self.restarts = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.conn is not None and self.ready is not None and self.ready.done() and not self.ready.exception()
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"alive": self.alive, "pending": len(self.pending), "rendered": self.rendered, "restarts": self.restarts}
+
+
+class WorkerPool:
+    """多进程渲染池
+
+    启动若干个渲染进程，每个进程拥有各自的 Playwright 驱动与浏览器，`render()` 会被分配到待处理任务最少的进程中执行，
+    使 Playwright 协议消息的编解码与截图数据的解码分摊到多个 CPU 核心上。
+    截图数据通过共享内存传回，而不是经由管道序列化。
+    渲染进程意外退出时会被重新启动，其上尚未完成的渲染会抛出 `WorkerError`。
+
+    Args:
+        processes (int): 渲染进程的数量
+        browser_type (Literal["chromium", "firefox", "webkit"]): 渲染进程所使用的浏览器
+        launch_config (dict[str, Any]): 浏览器的启动参数
+        context_config (dict[str, Any]): 渲染进程中全局上下文的参数
+        concurrency (int): 每个渲染进程同时进行的渲染数量上限。默认为 4
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        browser_type: Literal["chromium", "firefox", "webkit"],
+        launch_config: dict[str, Any],
+        context_config: dict[str, Any],
+        *,
+        concurrency: int = 4,
+    ) -> None:
+        if processes < 1 or concurrency < 1:
+            raise ValueError("processes and concurrency must be greater than 0")
+        self.browser_type = browser_type
+        self.launch_config = launch_config
+        self.context_config = context_config
+        self.concurrency = concurrency
+        self._workers = [_Worker(i) for i in range(processes)]
+        self._job_id = itertools.count()
+        self._closing = False
+        # 主进程中可能已有其他线程，使用 fork 并不安全
+        self._mp = multiprocessing.get_context("spawn")
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {"processes": len(self._workers), "workers": [worker.as_dict() for worker in self._workers]}
+
+    async def start(self) -> None:
+        """启动所有渲染进程，并等待其中的浏览器启动完成"""
+        self._loop = asyncio.get_running_loop()
+        self._closing = False
+        for worker in self._workers:
+            self._spawn(worker)
+        try:
+            await asyncio.gather(*(worker.ready for worker in self._workers))  # type: ignore
+        except BaseException:
+            await self.close()
+            raise
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """通知所有渲染进程在完成进行中的渲染后退出，超时未退出的进程将被终止"""
+        self._closing = True
+        for worker in self._workers:
+            if worker.conn is not None:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+        await asyncio.gather(*(self._join(worker, timeout) for worker in self._workers))
+
+    async def render(
+        self,
+        *,
+        content: str | None = None,
+        url: str | None = None,
+        wait_until: WaitUntil = "load",
+        selector: str | None = None,
+        full_page: bool = True,
+        options: dict[str, Any],
+        parameters: dict[str, Any],
+    ) -> bytes:
+        """在渲染进程中完成一次渲染，参数与 `render_page()` 相同，`parameters` 为新页面的参数"""
+        alive = [worker for worker in self._workers if worker.alive]
+        if not alive:
+            raise WorkerError(N_("No render worker is available."))
+        worker = min(alive, key=lambda w: len(w.pending))
+        job_id = next(self._job_id)
+        future = asyncio.get_running_loop().create_future()
+        worker.pending[job_id] = future
+        job = {
+            "content": content,
+            "url": url,
+            "wait_until": wait_until,
+            "selector": selector,
+            "full_page": full_page,
+            "options": options,
+            "parameters": parameters,
+        }
+        try:
+            try:
+                worker.conn.send((job_id, job))  # type: ignore
+            except OSError as e:
+                raise WorkerError(N_("Render worker #{index} exited unexpectedly.").format(index=worker.index)) from e
+            return await future
+        finally:
+            worker.pending.pop(job_id, None)
+
+    def _spawn(self, worker: _Worker) -> None:
+        assert self._loop is not None
+        parent, child = self._mp.Pipe()
+        worker.process = self._mp.Process(
+            target=_worker_main,
+            args=(child, self.browser_type, self.launch_config, self.context_config, self.concurrency),
+            name=f"graiax-playwright-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        child.close()
+        worker.conn = parent
+        worker.ready = self._loop.create_future()
+        threading.Thread(target=self._read, args=(worker, parent), daemon=True).start()
+
+    def _read(self, worker: _Worker, conn: Connection) -> None:
+        assert self._loop is not None
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            self._loop.call_soon_threadsafe(self._on_message, worker, *message)
+        self._loop.call_soon_threadsafe(self._on_exit, worker, conn)
+
+    def _on_message(self, worker: _Worker, job_id: int | None, status: str, payload: Any) -> None:
+        if status == "ready":
+            if worker.ready is not None and not worker.ready.done():
+                worker.ready.set_result(None)
+            return
+        future = worker.pending.pop(job_id, None)  # type: ignore
+        if status == "error":
+            if future is not None and not future.done():
+                future.set_exception(WorkerError(payload))
+            return
+
+        name, size = payload
+        segment = shared_memory.SharedMemory(name)
+        try:
+            data = bytes(segment.buf[:size])
+        finally:
+            segment.close()
+            segment.unlink()
+        worker.rendered += 1
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def _on_exit(self, worker: _Worker, conn: Connection) -> None:
+        if worker.conn is not conn:
+            return
+        worker.conn = None
+        conn.close()
+        error = WorkerError(N_("Render worker #{index} exited unexpectedly.").format(index=worker.index))
+        for future in worker.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        worker.pending.clear()
+        if worker.ready is not None and not worker.ready.done():
+            # 启动失败时不重新启动，以免反复失败
+            worker.ready.set_exception(error)
+            return
+        if self._closing:
+            return
+        log("error", str(error))
+        worker.restarts += 1
+        self._spawn(worker)
+
+    async def _join(self, worker: _Worker, timeout: float) -> None:
+        process = worker.process
+        if process is None:
+            return
+        await asyncio.to_thread(process.join, timeout)
+        if process.is_alive():
+            log(
+                "warning", N_("Render worker #{index} did not exit in time, terminating it.").format(index=worker.index)
+            )
+            process.terminate()
+            await asyncio.to_thread(process.join)
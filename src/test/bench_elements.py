@@ -0,0 +1,52 @@
+import time
+
+from creart import create
+from launart import Launart, Service
+
+from graiax.playwright import PlaywrightService
+
+CARDS = 50
+STYLE = "<style>.card { width: 320px; padding: 16px; margin: 8px; border-radius: 8px; background: #eef; }</style>"
+
+
+def card(index: int) -> str:
+    return f'<div class="card" data-capture="{index}"><h3>User {index}</h3><p>Level {index * 7 % 100}</p></div>'
+
+
+class Benchmark(Service):
+    id = "benchmark"
+
+    @property
+    def required(self):
+        return {"web.render/graiax.playwright"}
+
+    @property
+    def stages(self):
+        return {"blocking"}
+
+    async def launch(self, manager: Launart):
+        async with self.stage("blocking"):
+            pw_service = manager.get_component(PlaywrightService)
+            await pw_service.render(STYLE + card(0), coalesce=False)  # 预热
+
+            start = time.perf_counter()
+            for index in range(CARDS):
+                await pw_service.render(STYLE + card(index), selector=".card", coalesce=False)
+            per_page = time.perf_counter() - start
+
+            start = time.perf_counter()
+            images = [img async for _, img in pw_service.render_elements(STYLE + "".join(map(card, range(CARDS))))]
+            single_page = time.perf_counter() - start
+
+            assert len(images) == CARDS
+            print(f"per-page:    {per_page:.3f}s ({per_page / CARDS * 1000:.1f}ms/card)")
+            print(f"single-page: {single_page:.3f}s ({single_page / CARDS * 1000:.1f}ms/card)")
+            print(f"speedup:     {per_page / single_page:.2f}x")
+
+
+launart = create(Launart)
+
+launart.add_component(PlaywrightService("chromium"))
+launart.add_component(Benchmark())
+
+launart.launch_blocking()